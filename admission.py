@@ -0,0 +1,129 @@
+# python/app/admission.py
+import os
+import logging
+import redis
+
+from app.celery_app import celery
+
+logger = logging.getLogger("horaculo.admission")
+
+ACCEPT = "accept"
+DEGRADE = "degrade"   # aceita, mas sem a etapa OpenAI
+REJECT = "reject"     # 429 + Retry-After
+
+
+def _per_class(env: str, defaults: dict) -> dict:
+    """Overrides por classe: ADMISSION_MAX_WAIT="interactive=30,backfill=3600"."""
+    values = dict(defaults)
+    for pair in os.getenv(env, "").split(","):
+        if "=" in pair:
+            cls, value = pair.split("=", 1)
+            if cls.strip() in values:
+                values[cls.strip()] = float(value)
+    return values
+
+
+# ======================================================
+# CONFIG
+# ======================================================
+# Processos a consumir cada fila (os mesmos valores do docker-compose;
+# um worker por fila, para o backfill nunca ocupar o scheduled)
+QUEUE_CONCURRENCY = {
+    "interactive": int(os.getenv("QUEUE_CONCURRENCY_INTERACTIVE", "4")),
+    "scheduled": int(os.getenv("QUEUE_CONCURRENCY_SCHEDULED", "2")),
+    "backfill": int(os.getenv("QUEUE_CONCURRENCY_BACKFILL", "1")),
+}
+# Espera estimada (s) a partir da qual o pedido é degradado / rejeitado
+ADMISSION_DEGRADE_WAIT = _per_class("ADMISSION_DEGRADE_WAIT", {
+    "interactive": 20.0, "scheduled": float("inf"), "backfill": float("inf"),
+})
+ADMISSION_MAX_WAIT = _per_class("ADMISSION_MAX_WAIT", {
+    "interactive": 60.0, "scheduled": 900.0, "backfill": 3600.0,
+})
+ADMISSION_MAX_DEPTH = _per_class("ADMISSION_MAX_DEPTH", {
+    "interactive": 100, "scheduled": 500, "backfill": 5000,
+})
+
+# Duração típica de uma análise até haver medições
+DEFAULT_TASK_SECONDS = float(os.getenv("ADMISSION_DEFAULT_TASK_SECONDS", "8"))
+TASK_SECONDS_ALPHA = 0.2
+_TASK_SECONDS_KEY = "horaculo:admission:task_seconds"
+
+# Lê-calcula-grava num só passo no Redis: com GET + SET os workers em
+# paralelo escreviam por cima das amostras uns dos outros.
+_EWMA_UPDATE = """
+local prev = tonumber(redis.call('hget', KEYS[1], ARGV[1]) or ARGV[3])
+local value = tostring(prev + tonumber(ARGV[4]) * (tonumber(ARGV[2]) - prev))
+redis.call('hset', KEYS[1], ARGV[1], value)
+return value
+"""
+
+_CLIENT = None
+_EWMA_SCRIPT = None
+
+
+def _client():
+    # o broker é o Redis onde as filas vivem (lista com o nome da fila)
+    global _CLIENT, _EWMA_SCRIPT
+    if _CLIENT is None:
+        _CLIENT = redis.from_url(
+            celery.conf.broker_url,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5
+        )
+        _EWMA_SCRIPT = _CLIENT.register_script(_EWMA_UPDATE)
+    return _CLIENT
+
+
+# ======================================================
+# MEDIÇÃO
+# ======================================================
+def queue_depth(priority: str) -> int:
+    return int(_client().llen(priority))
+
+
+def expected_task_seconds(priority: str) -> float:
+    raw = _client().hget(_TASK_SECONDS_KEY, priority)
+    return float(raw) if raw else DEFAULT_TASK_SECONDS
+
+
+def record_task_seconds(priority: str, seconds: float):
+    """EWMA da duração por classe (chamado pelo worker no fim de cada tarefa)."""
+    try:
+        _client()  # cria o cliente e regista o script
+        _EWMA_SCRIPT(
+            keys=[_TASK_SECONDS_KEY],
+            args=[priority, seconds, DEFAULT_TASK_SECONDS, TASK_SECONDS_ALPHA]
+        )
+    except redis.RedisError as e:
+        logger.debug(f"Falha ao registar duração ({priority}): {e}")
+
+
+def estimate_wait(priority: str):
+    """(profundidade da fila, espera estimada em s até começar a correr)."""
+    depth = queue_depth(priority)
+    concurrency = max(1.0, QUEUE_CONCURRENCY.get(priority, 1.0))
+    return depth, depth * expected_task_seconds(priority) / concurrency
+
+
+# ======================================================
+# DECISÃO
+# ======================================================
+def admit(priority: str):
+    """
+    Devolve (decisão, carga). Sem Redis não há medição: aceita (o envio
+    da tarefa falha a seguir de qualquer forma).
+    """
+    try:
+        depth, wait = estimate_wait(priority)
+    except redis.RedisError as e:
+        logger.warning(f"Admissão sem medição da fila {priority}: {e}")
+        return ACCEPT, None
+
+    load = {"queue": priority, "depth": depth, "estimated_wait": round(wait, 1)}
+    if depth >= ADMISSION_MAX_DEPTH[priority] or wait > ADMISSION_MAX_WAIT[priority]:
+        logger.warning(f"Pedido rejeitado ({priority}): fila {depth}, espera ~{wait:.0f}s")
+        return REJECT, load
+    if wait > ADMISSION_DEGRADE_WAIT[priority]:
+        return DEGRADE, load
+    return ACCEPT, load
@@ -1,7 +1,17 @@
 # python/app/alerts.py
 import os
-import requests
+import time
+import atexit
+import asyncio
+import hashlib
 import logging
+import threading
+from collections import deque
+
+import redis
+
+from app.cache import get_redis
+from app.http_pool import get_client, get_loop
 
 logger = logging.getLogger("horaculo.alerts")
 if not logger.handlers:
@@ -14,14 +24,224 @@ logger.setLevel(logging.INFO)
 TELEGRAM_BOT = os.getenv("TG_BOT_TOKEN")
 TELEGRAM_CHAT = os.getenv("TG_CHAT_ID")
 
-def send_telegram(text, timeout=10):
+# Fila limitada: em rajada descartam-se alertas novos, nunca se bloqueia a query
+ALERT_QUEUE_MAX = int(os.getenv("ALERT_QUEUE_MAX", "100"))
+# Alertas iguais (mesmo texto ou dedupe_key) dentro da janela são ignorados.
+# A marca vive no Redis (SET NX EX): vale para todos os workers; sem Redis
+# cada processo deduplica só o que ele próprio enviou.
+ALERT_DEDUPE_WINDOW = float(os.getenv("ALERT_DEDUPE_WINDOW", "900"))
+ALERT_DEDUPE_PREFIX = "horaculo:alert:seen:"
+# Espera para juntar uma rajada numa só mensagem
+ALERT_BATCH_WINDOW = float(os.getenv("ALERT_BATCH_WINDOW", "2"))
+ALERT_BATCH_MAX = int(os.getenv("ALERT_BATCH_MAX", "10"))
+# Intervalo mínimo entre envios para o mesmo chat (limite do Telegram ~20/min).
+# Partilhado por todos os processos via Redis (SET NX PX); sem Redis cada
+# processo respeita só o seu.
+ALERT_MIN_INTERVAL = float(os.getenv("ALERT_MIN_INTERVAL", "3"))
+ALERT_RATE_PREFIX = "horaculo:alert:rate:"
+TELEGRAM_MAX_CHARS = 4096
+
+
+class AlertDispatcher:
+    """
+    Envio em background no loop de I/O do processo (ver http_pool), com o
+    cliente HTTP pooled. enqueue() é thread-safe e não bloqueia.
+    """
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self._pending = deque()
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._loop = get_loop()
+        self._wakeup = None
+        self._last_send = 0.0
+        self._idle = threading.Event()
+        self._idle.set()
+        asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+
+    # ---------- produtor ----------
+    def _claim(self, key):
+        """True se nenhum processo enviou este alerta dentro da janela."""
+        try:
+            rds = get_redis()
+            return bool(rds.call(
+                rds.client.set,
+                ALERT_DEDUPE_PREFIX + key,
+                1,
+                nx=True,
+                ex=max(1, int(ALERT_DEDUPE_WINDOW))
+            ))
+        except redis.RedisError as e:
+            logger.debug("Dedupe de alertas só local (Redis indisponível): %s", e)
+            return True
+
+    def enqueue(self, text, dedupe_key=None):
+        key = hashlib.md5((dedupe_key or text).encode("utf-8")).hexdigest()
+        now = time.monotonic()
+        with self._lock:
+            duplicate = now - self._seen.get(key, -ALERT_DEDUPE_WINDOW) < ALERT_DEDUPE_WINDOW
+            full = len(self._pending) >= ALERT_QUEUE_MAX
+        if not duplicate and full:
+            logger.warning("Fila de alertas cheia (%s); alerta descartado.", ALERT_QUEUE_MAX)
+            return False
+        if duplicate or not self._claim(key):
+            logger.debug("Alerta duplicado ignorado: %s", (dedupe_key or text)[:80])
+            return False
+
+        with self._lock:
+            self._seen[key] = now
+            if len(self._seen) > 4 * ALERT_QUEUE_MAX:
+                self._seen = {
+                    k: t for k, t in self._seen.items()
+                    if now - t < ALERT_DEDUPE_WINDOW
+                }
+            self._pending.append(text)
+            self._idle.clear()
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    def flush(self, timeout=5.0):
+        """Espera (no máximo `timeout` s) que a fila esvazie."""
+        return self._idle.wait(timeout)
+
+    # ---------- consumidor ----------
+    def _reserve_send(self):
+        """
+        Reserva o próximo envio ao chat para todos os processos. Devolve 0
+        se pode enviar já, os segundos até a reserva de outro expirar, ou
+        None sem Redis.
+        """
+        rds = get_redis()
+        key = ALERT_RATE_PREFIX + str(TELEGRAM_CHAT)
+        try:
+            if rds.call(rds.client.set, key, 1, nx=True, px=max(1, int(ALERT_MIN_INTERVAL * 1000))):
+                return 0.0
+            ttl_ms = rds.call(rds.client.pttl, key)
+        except redis.RedisError as e:
+            logger.debug("Limite de envio só local (Redis indisponível): %s", e)
+            return None
+        # -2: expirou entretanto; tenta de novo já a seguir
+        return max(ttl_ms, 1) / 1000.0
+
+    async def _wait_send_slot(self):
+        while True:
+            # chamada bloqueante ao Redis fora do loop de I/O
+            wait = await asyncio.to_thread(self._reserve_send)
+            if wait is None:
+                wait = self._last_send + ALERT_MIN_INTERVAL - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def _take_batch(self):
+        with self._lock:
+            batch = []
+            size = 0
+            while self._pending and len(batch) < ALERT_BATCH_MAX:
+                nxt = self._pending[0][:TELEGRAM_MAX_CHARS]
+                if batch and size + len(nxt) + 2 > TELEGRAM_MAX_CHARS:
+                    break
+                batch.append(nxt)
+                size += len(nxt) + 2
+                self._pending.popleft()
+            return batch
+
+    async def _run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            # verificação e idle sob o lock: um enqueue concorrente ou já
+            # entrou na fila (e não paramos) ou limpa o idle depois disto
+            with self._lock:
+                empty = not self._pending
+                if empty:
+                    self._idle.set()
+            if empty:
+                await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # junta o que chegar durante a janela numa só mensagem
+            await asyncio.sleep(ALERT_BATCH_WINDOW)
+            batch = self._take_batch()
+            if not batch:
+                continue
+
+            await self._wait_send_slot()
+            try:
+                await self._send("\n\n".join(batch))
+            except Exception as e:
+                logger.exception("Error sending Telegram message: %s", e)
+            self._last_send = time.monotonic()
+
+    async def _send(self, text, retries=1):
+        url = f"https://api.telegram.org/bot{TELEGRAM_BOT}/sendMessage"
+        resp = await get_client().post(
+            url,
+            json={"chat_id": TELEGRAM_CHAT, "text": text},
+            timeout=self.timeout
+        )
+        if resp.status_code == 429 and retries > 0:
+            # rate limit do Telegram: espera o que ele pedir e tenta de novo
+            try:
+                retry_after = float(resp.json().get("parameters", {}).get("retry_after", 5))
+            except ValueError:
+                retry_after = 5.0
+            logger.warning("Telegram rate limit; retry in %.0fs", retry_after)
+            await asyncio.sleep(retry_after)
+            return await self._send(text, retries - 1)
+        if resp.status_code >= 400:
+            logger.warning("Telegram send failed: status=%s body=%s", resp.status_code, resp.text[:500])
+
+
+_DISPATCHER = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def get_dispatcher(timeout=10):
+    global _DISPATCHER
+    with _DISPATCHER_LOCK:
+        if _DISPATCHER is None:
+            _DISPATCHER = AlertDispatcher(timeout=timeout)
+    return _DISPATCHER
+
+
+def send_telegram(text, timeout=10, dedupe_key=None):
+    """
+    Agenda o alerta e retorna de imediato (entrega fora do caminho crítico).
+    `dedupe_key`: chave para deduplicar alertas cujo texto varia (ex.: a query).
+    """
     if not TELEGRAM_BOT or not TELEGRAM_CHAT:
         logger.debug("Telegram not configured; skipping send_telegram")
-        return
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT}/sendMessage"
-    try:
-        r = requests.post(url, json={"chat_id": TELEGRAM_CHAT, "text": text}, timeout=timeout)
-        if not r.ok:
-            logger.warning("Telegram send failed: status=%s body=%s", r.status_code, r.text[:500])
-    except requests.RequestException as e:
-        logger.exception("Error sending Telegram message: %s", e)
\ No newline at end of file
+        return False
+    return get_dispatcher(timeout).enqueue(text, dedupe_key)
+
+
+def flush_alerts(timeout=5.0):
+    """
+    Espera que os alertas pendentes deste processo sejam enviados.
+    Chamado no atexit e, nos filhos do prefork (que saem com os._exit e
+    não correm o atexit), pelo worker_process_shutdown do worker.
+    """
+    if _DISPATCHER is not None and not _DISPATCHER.flush(timeout):
+        logger.warning("Alertas pendentes perdidos no shutdown.")
+
+
+def _flush_at_exit():
+    flush_alerts(5.0)
+
+
+def _reset_after_fork():
+    # o consumidor vivia no loop do pai (não sobrevive ao fork)
+    global _DISPATCHER, _DISPATCHER_LOCK
+    _DISPATCHER = None
+    _DISPATCHER_LOCK = threading.Lock()
+
+
+# registado depois do http_pool: corre antes de o loop de I/O parar
+atexit.register(_flush_at_exit)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,63 +1,178 @@
 # python/app/api.py
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 from celery.result import AsyncResult
-from app.worker import analyze_market_task, celery
-from app.variants.crypto import CryptoSatellite # Importa o Satélite
+# Só a config do Celery: a API não importa o worker nem os modelos
+from app.celery_app import celery, PRIORITY_CLASSES
+from app.admission import admit, DEGRADE, REJECT
+from app.variants.crypto import get_satellite # Importa o Satélite
+from app.cache import INFLIGHT_PENDING_GRACE, claim_inflight_task, clear_inflight_task
+from app.progress import DONE, ERROR, final_payload, iter_stages, sse_event
 import os
+import json
+import uuid
+import asyncio
 import logging
 
-app = FastAPI()
 logger = logging.getLogger("horaculo.api")
 
+# Carrega os modelos do satélite cripto em background após o arranque
+# (a API fica pronta logo; sem warmup o 1º pedido cripto paga o cold start)
+API_WARMUP = os.getenv("API_WARMUP", "0") == "1"
+_WARMUP_TASK = None
+
+
+async def _warmup():
+    try:
+        await asyncio.to_thread(get_satellite().warmup)
+        logger.info("Warmup do satélite cripto concluído.")
+    except Exception as e:
+        logger.warning(f"Warmup falhou (modelos carregam no 1º pedido): {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global _WARMUP_TASK
+    if API_WARMUP:
+        _WARMUP_TASK = asyncio.create_task(_warmup())
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
 # Modelo de Input
 class Query(BaseModel):
     q: str
     use_openai: bool = False
+    # interactive | scheduled | backfill (fila e limites de admissão próprios)
+    priority: str = "interactive"
 
 # --- ROTA 1: MERCADO TRADICIONAL (Async/Celery) ---
 @app.post("/analyze/submit")
 async def submit_analysis(q: Query):
     """
     Inicia o motor completo (Macro, Commodities) via Celery Worker.
+    Com a fila da classe sobrecarregada o pedido é degradado (sem OpenAI)
+    ou rejeitado com 429.
     """
-    task = analyze_market_task.delay(
-        query=q.q,
-        newsapi_key=os.getenv("NEWSAPI_KEY"),
-        use_openai=q.use_openai,
-        openai_key=os.getenv("OPENAI_API_KEY")
-    )
-    return {"task_id": task.id, "status": "processing"}
+    if q.priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"priority deve ser um de {PRIORITY_CLASSES}")
+
+    decision, load = admit(q.priority)
+    if decision == REJECT:
+        raise HTTPException(
+            status_code=429,
+            detail={"error": "QUEUE_FULL", **load},
+            headers={"Retry-After": str(int(load["estimated_wait"]) + 1)}
+        )
+    use_openai = q.use_openai and decision != DEGRADE
+
+    # Pedido idêntico já na fila/em execução -> devolve a mesma tarefa.
+    # Até o worker a assumir, o registo só vale a espera estimada + folga.
+    task_id = uuid.uuid4().hex
+    pending_ttl = int((load or {}).get("estimated_wait", 0)) + INFLIGHT_PENDING_GRACE
+    existing = claim_inflight_task(q.q, task_id, ttl=pending_ttl, use_openai=use_openai)
+    if existing:
+        if AsyncResult(existing, app=celery).state != 'FAILURE':
+            return {"task_id": existing, "status": "processing", "deduplicated": True}
+        clear_inflight_task(q.q, existing, use_openai=use_openai)
+        winner = claim_inflight_task(q.q, task_id, ttl=pending_ttl, use_openai=use_openai)
+        if winner:
+            # outro pedido limpou a tarefa falhada e enfileirou primeiro
+            return {"task_id": winner, "status": "processing", "deduplicated": True}
+
+    try:
+        task = celery.send_task(
+            "analyze_market_task",
+            kwargs=dict(
+                query=q.q,
+                newsapi_key=os.getenv("NEWSAPI_KEY"),
+                use_openai=use_openai,
+                openai_key=os.getenv("OPENAI_API_KEY")
+            ),
+            task_id=task_id,
+            queue=q.priority
+        )
+    except Exception as e:
+        # nada foi enfileirado: o registo apontaria para uma tarefa que não existe
+        clear_inflight_task(q.q, task_id, use_openai=use_openai)
+        logger.error(f"Falha ao enfileirar análise: {e}")
+        raise HTTPException(status_code=503, detail="BROKER_UNAVAILABLE")
+    response = {"task_id": task.id, "status": "processing", "priority": q.priority}
+    if load:
+        response["estimated_wait"] = load["estimated_wait"]
+    if use_openai != q.use_openai:
+        response["degraded"] = ["openai_analysis"]
+    return response
 
 @app.get("/analyze/status/{task_id}")
-async def get_status(task_id: str):
+async def get_status(task_id: str, fields: str = "ui"):
     """
     Polling para o Frontend Web/Mobile.
+    `fields`: chaves do resultado a devolver, separadas por vírgula
+    (default "ui" — Telas 1-4; "full" devolve o resultado completo).
     """
     task_result = AsyncResult(task_id, app=celery)
     
     if task_result.state == 'SUCCESS':
-        return {
-            "state": "SUCCESS",
-            "ui": task_result.result.get("ui"), # Payload formatado para as Telas 1-4
-            "full_data": task_result.result
-        }
+        result = task_result.result or {}
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        if "full" in wanted:
+            return {"state": "SUCCESS", "full_data": result}
+        response = {"state": "SUCCESS"}
+        response.update({f: result.get(f) for f in wanted})
+        return response
     elif task_result.state == 'FAILURE':
         return {"state": "FAILURE", "error": str(task_result.info)}
     
     return {"state": task_result.state}
 
-# --- ROTA 2: SATÉLITE CRIPTO (Sync/Fast) ---
+@app.get("/analyze/stream/{task_id}")
+async def stream_analysis(task_id: str):
+    """
+    Alternativa ao polling (Server-Sent Events): cada tela é enviada assim
+    que o worker a produz (screen_arbitrage, screen_intelligence,
+    screen_stress, screen_portal) e termina com `done` (ou `error`).
+    """
+    return StreamingResponse(
+        _stream_events(task_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _stream_events(task_id: str):
+    # tarefa já terminada (ou stream expirado): só o resultado final
+    task_result = AsyncResult(task_id, app=celery)
+    if task_result.state == 'SUCCESS':
+        yield sse_event(DONE, json.dumps(final_payload(task_result.result), default=str))
+        return
+    if task_result.state == 'FAILURE':
+        yield sse_event(ERROR, json.dumps({"error": str(task_result.info)}))
+        return
+
+    try:
+        async for event, data in iter_stages(task_id):
+            if data is None:
+                yield ": ping\n\n"
+                continue
+            yield sse_event(event, data)
+    except Exception as e:
+        logger.error(f"Stream de {task_id} interrompido: {e}")
+        yield sse_event(ERROR, json.dumps({"error": str(e)}))
+
+# --- ROTA 2: SATÉLITE CRIPTO (Async/Fast) ---
 @app.post("/analyze/crypto")
 async def analyze_crypto(q: Query):
     """
     Rota direta para a 5ª Tela (Cripto).
-    Ignora filas do Celery para resposta imediata.
+    Ignora filas do Celery para resposta imediata; feeds em paralelo no loop,
+    embeddings/FinBERT/C++ numa thread para não bloquear os outros pedidos.
     """
     try:
         logger.info(f"Iniciando Satélite Cripto para: {q.q}")
-        satellite = CryptoSatellite()
-        result = satellite.run_analysis(q.q)
+        result = await get_satellite().run_analysis_async(q.q)
         return result
     except Exception as e:
         logger.error(f"Erro no Satélite Cripto: {e}")
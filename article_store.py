@@ -0,0 +1,327 @@
+# python/app/article_store.py
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import psycopg2
+import numpy as np
+
+from memory import get_db_connection, fts_match_expr, DATABASE_URL
+from relevance import canonicalize_url
+
+logger = logging.getLogger("horaculo.article_store")
+
+# Janela de notícias consideradas "frescas" para uma query
+ARTICLE_MAX_AGE_HOURS = float(os.getenv("ARTICLE_MAX_AGE_HOURS", "72"))
+# Retenção física da tabela (o poller poda a cada ciclo)
+ARTICLE_RETENTION_HOURS = float(os.getenv("ARTICLE_RETENTION_HOURS", "336"))
+
+
+def url_key(url: str, text: str = "") -> str:
+    """Chave estável do artigo (URL canónica; texto quando o feed não traz link)."""
+    return hashlib.md5((canonicalize_url(url) or text.strip()).encode("utf-8")).hexdigest()
+
+
+def _migrate_url_keys(cur, placeholder: str) -> int:
+    """
+    Reescreve as chaves gravadas antes da URL canónica (md5 da URL crua),
+    senão o dedupe deixa de reconhecer os artigos já na store. Idempotente;
+    quando a chave nova já existe, a linha antiga é uma repetição e sai.
+    """
+    cur.execute("SELECT url_hash, url, text FROM articles")
+    rows = cur.fetchall()
+    existing = {r[0] for r in rows}
+    changed = 0
+    for old, url, text in rows:
+        new = url_key(url or "", text or "")
+        if new == old:
+            continue
+        if new in existing:
+            cur.execute(f"DELETE FROM articles WHERE url_hash = {placeholder}", (old,))
+        else:
+            cur.execute(
+                f"UPDATE articles SET url_hash = {placeholder} WHERE url_hash = {placeholder}",
+                (new, old)
+            )
+            existing.add(new)
+        existing.discard(old)
+        changed += 1
+    if changed:
+        logger.info(f"Chaves de {changed} artigos migradas para a URL canónica.")
+    return changed
+
+
+# ======================================================
+# SCHEMA
+# ======================================================
+# Versão dos dados em `articles`; cada passo de migração corre uma só vez
+# 1: url_hash sobre a URL canónica
+# 2: busca textual indexa também o corpo (text), como o scorer
+ARTICLE_SCHEMA_VERSION = 2
+
+# Mesmos campos que relevance.scored_text; pesos título > descrição > corpo
+_PG_SEARCH_EXPR = """
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(text, '')), 'D')
+"""
+
+_SQLITE_FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+        title, description, text,
+        content='articles', content_rowid='rowid'
+    );
+    CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+        INSERT INTO articles_fts(rowid, title, description, text)
+        VALUES (new.rowid, new.title, new.description, new.text);
+    END;
+    CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+        INSERT INTO articles_fts(articles_fts, rowid, title, description, text)
+        VALUES ('delete', old.rowid, old.title, old.description, old.text);
+    END;
+"""
+
+
+def _reindex_with_body(cur):
+    """Recria a busca textual de instalações antigas (só título + descrição)."""
+    if DATABASE_URL:
+        # a expressão de uma coluna gerada não se altera: recria-se (e o GIN)
+        cur.execute("ALTER TABLE articles DROP COLUMN IF EXISTS search")
+        cur.execute(f"ALTER TABLE articles ADD COLUMN search tsvector GENERATED ALWAYS AS ({_PG_SEARCH_EXPR}) STORED")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_articles_search ON articles USING GIN (search)")
+        return
+    try:
+        cur.executescript("""
+            DROP TRIGGER IF EXISTS articles_ai;
+            DROP TRIGGER IF EXISTS articles_ad;
+            DROP TABLE IF EXISTS articles_fts;
+        """ + _SQLITE_FTS_SCHEMA)
+        cur.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 indisponível no SQLite, busca de artigos via LIKE: {e}")
+
+
+def _schema_version(cur, placeholder: str) -> int:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            component TEXT PRIMARY KEY,
+            version INTEGER
+        )
+    """)
+    cur.execute(f"SELECT version FROM schema_version WHERE component = {placeholder}", ("articles",))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def _set_schema_version(cur, placeholder: str, version: int):
+    if DATABASE_URL:
+        cur.execute("""
+            INSERT INTO schema_version (component, version) VALUES (%s, %s)
+            ON CONFLICT (component) DO UPDATE SET version = EXCLUDED.version
+        """, ("articles", version))
+    else:
+        cur.execute("REPLACE INTO schema_version (component, version) VALUES (?, ?)", ("articles", version))
+
+
+def init_article_store():
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    if DATABASE_URL:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS articles (
+                url_hash TEXT PRIMARY KEY,
+                source TEXT,
+                title TEXT,
+                description TEXT,
+                text TEXT,
+                url TEXT,
+                published_at TEXT,
+                ingested_at BIGINT,
+                claim TEXT,
+                embedding BYTEA,
+                sentiment REAL,
+                search tsvector GENERATED ALWAYS AS ({_PG_SEARCH_EXPR}) STORED
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_articles_search ON articles USING GIN (search)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_articles_ingested ON articles (ingested_at DESC)")
+    else:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url_hash TEXT PRIMARY KEY,
+                source TEXT,
+                title TEXT,
+                description TEXT,
+                text TEXT,
+                url TEXT,
+                published_at TEXT,
+                ingested_at INTEGER,
+                claim TEXT,
+                embedding BLOB,
+                sentiment REAL
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_articles_ingested ON articles (ingested_at DESC)")
+        try:
+            cur.executescript(_SQLITE_FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 indisponível no SQLite, busca de artigos via LIKE: {e}")
+
+    placeholder = "%s" if DATABASE_URL else "?"
+    version = _schema_version(cur, placeholder)
+    if version < 1:
+        _migrate_url_keys(cur, placeholder)
+    if version < 2:
+        _reindex_with_body(cur)
+    if version < ARTICLE_SCHEMA_VERSION:
+        _set_schema_version(cur, placeholder, ARTICLE_SCHEMA_VERSION)
+    conn.commit()
+    conn.close()
+
+
+# ======================================================
+# ESCRITA
+# ======================================================
+def known_urls(keys) -> set:
+    """Quais url_hash já estão na store (evita reprocessar no poller)."""
+    keys = list(keys)
+    if not keys:
+        return set()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    placeholder = "%s" if DATABASE_URL else "?"
+    cur.execute(
+        f"SELECT url_hash FROM articles WHERE url_hash IN ({', '.join([placeholder] * len(keys))})",
+        keys
+    )
+    found = {r[0] for r in cur.fetchall()}
+    conn.close()
+    return found
+
+
+def store_articles(items):
+    """
+    Grava artigos já processados. Cada item traz os campos do ingest
+    mais `claim`, `embedding` e `sentiment` calculados uma única vez.
+    """
+    if not items:
+        return 0
+    now = int(time.time())
+    rows = [
+        (
+            url_key(it.get("url", ""), it.get("text", "")),
+            it.get("source", "unknown"),
+            it.get("title", ""),
+            it.get("description", ""),
+            it.get("text", ""),
+            it.get("url", ""),
+            it.get("publishedAt"),
+            now,
+            it.get("claim"),
+            np.asarray(it["embedding"], dtype=np.float32).tobytes() if it.get("embedding") is not None else None,
+            it.get("sentiment")
+        )
+        for it in items
+    ]
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    if DATABASE_URL:
+        rows = [r[:9] + (psycopg2.Binary(r[9]) if r[9] else None,) + r[10:] for r in rows]
+        cur.executemany("""
+            INSERT INTO articles
+                (url_hash, source, title, description, text, url, published_at,
+                 ingested_at, claim, embedding, sentiment)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (url_hash) DO NOTHING
+        """, rows)
+    else:
+        cur.executemany("""
+            INSERT OR IGNORE INTO articles
+                (url_hash, source, title, description, text, url, published_at,
+                 ingested_at, claim, embedding, sentiment)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def prune_articles(retention_hours: float = ARTICLE_RETENTION_HOURS):
+    cutoff = int(time.time() - retention_hours * 3600)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    placeholder = "%s" if DATABASE_URL else "?"
+    cur.execute(f"DELETE FROM articles WHERE ingested_at < {placeholder}", (cutoff,))
+    removed = cur.rowcount
+    conn.commit()
+    conn.close()
+    return removed
+
+
+# ======================================================
+# LEITURA (USADA PELO run_query)
+# ======================================================
+_COLUMNS = "a.source, a.title, a.description, a.text, a.url, a.published_at, a.claim, a.embedding, a.sentiment"
+
+
+def _row_to_item(r):
+    return {
+        "source": r[0],
+        "title": r[1] or "",
+        "description": r[2] or "",
+        "text": r[3] or "",
+        "url": r[4] or "",
+        "publishedAt": r[5],
+        "claim": r[6],
+        "embedding": np.frombuffer(bytes(r[7]), dtype=np.float32).tolist() if r[7] is not None else None,
+        "sentiment": r[8]
+    }
+
+
+def search_articles(query: str, limit: int = 40, max_age_hours: float = ARTICLE_MAX_AGE_HOURS):
+    """Artigos recentes relevantes para `query`, por relevância textual."""
+    since = int(time.time() - max_age_hours * 3600)
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    if DATABASE_URL:
+        cur.execute(f"""
+            SELECT {_COLUMNS}
+            FROM articles a
+            WHERE a.search @@ websearch_to_tsquery('simple', %s)
+              AND a.ingested_at >= %s
+            ORDER BY ts_rank(a.search, websearch_to_tsquery('simple', %s)) DESC,
+                     a.ingested_at DESC
+            LIMIT %s
+        """, (query, since, query, limit))
+        rows = cur.fetchall()
+    else:
+        match = fts_match_expr(query)
+        if not match:
+            conn.close()
+            return []
+        try:
+            cur.execute(f"""
+                SELECT {_COLUMNS}
+                FROM articles_fts
+                JOIN articles a ON a.rowid = articles_fts.rowid
+                WHERE articles_fts MATCH ? AND a.ingested_at >= ?
+                ORDER BY bm25(articles_fts, 2.0, 1.0, 0.5), a.ingested_at DESC
+                LIMIT ?
+            """, (match, since, limit))
+        except sqlite3.OperationalError:
+            cur.execute(f"""
+                SELECT {_COLUMNS}
+                FROM articles a
+                WHERE (a.title LIKE ? OR a.description LIKE ? OR a.text LIKE ?)
+                  AND a.ingested_at >= ?
+                ORDER BY a.ingested_at DESC
+                LIMIT ?
+            """, (f"%{query}%", f"%{query}%", f"%{query}%", since, limit))
+        rows = cur.fetchall()
+
+    conn.close()
+    return [_row_to_item(r) for r in rows]
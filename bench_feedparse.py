@@ -0,0 +1,81 @@
+# python/bench_feedparse.py
+"""
+Benchmark do parse de feeds no event loop: N fetches simulados (latências
+escalonadas) seguidos de parse inline, num thread ou num processo. Mede o
+tempo total e a maior paragem do loop (o que atrasa os outros fetches).
+
+    python bench_feedparse.py
+    python bench_feedparse.py --feeds 12 --entries 50
+"""
+import time
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from app.ingest import _parse_feed_items
+
+
+def make_feed(entries: int) -> bytes:
+    items = "".join(
+        f"<item><title>Oil prices rise as OPEC cuts output ({i})</title>"
+        f"<link>https://example.test/{i}</link>"
+        f"<description>{'Markets moved sharply on the news. ' * 20}</description>"
+        f"<pubDate>Mon, 06 Sep 2021 16:45:00 +0000</pubDate></item>"
+        for i in range(entries)
+    )
+    return (
+        "<?xml version='1.0'?><rss version='2.0'><channel><title>Bench</title>"
+        f"{items}</channel></rss>"
+    ).encode()
+
+
+async def run(pool, content: bytes, feeds: int, latency: float):
+    loop = asyncio.get_running_loop()
+    stalls = []
+
+    async def ticker():
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - t0 - 0.005)
+
+    async def fetch_and_parse(i):
+        await asyncio.sleep(latency * (1 + i % 3))
+        if pool is None:
+            return _parse_feed_items(content)
+        return await loop.run_in_executor(pool, _parse_feed_items, content)
+
+    tick = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(fetch_and_parse(i) for i in range(feeds)))
+    wall = time.perf_counter() - t0
+    tick.cancel()
+    return wall, max(stalls, default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Horaculo feed parse benchmark")
+    parser.add_argument("--feeds", type=int, default=6)
+    parser.add_argument("--entries", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.15, help="Latência simulada (s)")
+    args = parser.parse_args()
+
+    content = make_feed(args.entries)
+    t0 = time.perf_counter()
+    _parse_feed_items(content)
+    print(f"um parse: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    for name, pool in (
+        ("inline", None),
+        ("thread", ThreadPoolExecutor(max_workers=1)),
+        ("processos", ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("forkserver"))),
+    ):
+        if pool is not None:
+            asyncio.run(run(pool, content, 2, 0.0))  # arranque do pool fora da medida
+        wall, stall = asyncio.run(run(pool, content, args.feeds, args.latency))
+        print(f"{name:<10} total {wall * 1000:.0f} ms  maior paragem do loop {stall * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# python/bench_startup.py
+"""
+Benchmark de arranque: importa cada módulo num processo novo e mede tempo,
+memória (RSS máximo) e que bibliotecas pesadas ficaram carregadas.
+
+    python bench_startup.py                 # app.api
+    python bench_startup.py app.api app.worker --budget 1.0
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Não devem entrar no processo da API só por importar módulos
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "sklearn")
+
+_PROBE = """
+import sys, time, json, resource
+t0 = time.perf_counter()
+import importlib
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_kb / 1024, "heavy": heavy}}))
+"""
+
+
+def measure(module: str, runs: int = 3) -> dict:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            env=dict(os.environ, API_WARMUP="0")
+        )
+        if out.returncode != 0:
+            return {"module": module, "error": out.stderr.strip().splitlines()[-1:]}
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    best = min(samples, key=lambda s: s["seconds"])
+    return {"module": module, **best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Horaculo startup benchmark")
+    parser.add_argument("modules", nargs="*", default=["app.api"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1.0, help="Max import seconds")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        res = measure(module, args.runs)
+        if "error" in res:
+            print(f"{module:<24} ERRO: {' '.join(res['error'])}")
+            failed = True
+            continue
+        heavy = ", ".join(res["heavy"]) or "-"
+        print(f"{module:<24} {res['seconds']:.3f}s  {res['rss_mb']:.0f} MB  pesados: {heavy}")
+        failed |= res["seconds"] > args.budget or bool(res["heavy"])
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
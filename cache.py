@@ -1,15 +1,238 @@
 # python/app/cache.py
+import copy
 import json
+import time
+import re
 import redis
 import os
 import logging
 import hashlib
+import uuid
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from app import serialization
 
 logger = logging.getLogger("horaculo.cache")
 
 # Conecta ao mesmo Redis do Celery
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-r = redis.from_url(REDIS_URL)
+# Timeouts curtos: com o Redis em baixo o cache tem de falhar depressa,
+# não prender o pedido nos timeouts do SO.
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+
+# Circuit breaker: após N falhas seguidas deixa de tentar o Redis durante
+# o cooldown e o cache passa a só local; depois deixa passar uma sonda.
+REDIS_BREAKER_THRESHOLD = int(os.getenv("REDIS_BREAKER_THRESHOLD", "3"))
+REDIS_BREAKER_COOLDOWN = float(os.getenv("REDIS_BREAKER_COOLDOWN", "30"))
+
+# Tier local (por processo) à frente do Redis
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "256"))
+# com o Redis saudável, quanto tempo confiar na cópia local sem reler
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "30"))
+
+# Tier semântico: queries quase iguais dentro da janela reaproveitam o resultado
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_WINDOW = int(os.getenv("SEMANTIC_CACHE_WINDOW", "600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+
+# field = query normalizada; embeddings em float32 cru (3 KB vs ~15 KB em JSON)
+SEMANTIC_EMB_KEY = "horaculo:semantic:emb"
+SEMANTIC_META_KEY = "horaculo:semantic:meta"
+
+# Stale-while-revalidate: passado o soft TTL serve-se o resultado marcado
+# como stale e dispara-se um refresh; o Redis só o apaga no hard TTL.
+CACHE_SOFT_TTL = int(os.getenv("CACHE_SOFT_TTL", "600"))
+CACHE_HARD_TTL = int(os.getenv("CACHE_HARD_TTL", "3600"))
+# Refresh proativo das queries mais acedidas (ver refresh_hot_queries)
+HOT_QUERY_TOP_K = int(os.getenv("HOT_QUERY_TOP_K", "20"))
+HOT_QUERY_MIN_HITS = float(os.getenv("HOT_QUERY_MIN_HITS", "3"))
+HOT_KEY = "horaculo:hot:score"
+HOT_QUERY_KEY = "horaculo:hot:query"
+# contagem de acessos enviada em lote, fora do caminho do pedido
+HOT_ACCESS_FLUSH_SECONDS = float(os.getenv("HOT_ACCESS_FLUSH_SECONDS", "5"))
+
+# Single-flight: um só pipeline por query normalizada
+SINGLE_FLIGHT_TTL = int(os.getenv("SINGLE_FLIGHT_TTL", "300"))
+SINGLE_FLIGHT_WAIT = float(os.getenv("SINGLE_FLIGHT_WAIT", "90"))
+INFLIGHT_TASK_TTL = int(os.getenv("INFLIGHT_TASK_TTL", "900"))
+# Folga sobre a espera estimada na fila antes de o worker assumir a tarefa:
+# uma tarefa perdida antes de arrancar aparece como PENDING, não FAILURE,
+# e não pode segurar o dedupe durante o INFLIGHT_TASK_TTL inteiro.
+INFLIGHT_PENDING_GRACE = int(os.getenv("INFLIGHT_PENDING_GRACE", "60"))
+
+_TOKEN = re.compile(r"\w+|[()]", re.UNICODE)
+# Operadores mudam a pergunta ("btc NOT etf" != "btc etf"): ficam na chave
+_QUERY_OPERATORS = {"and", "or", "not"}
+_QUERY_NOISE = {"the", "a", "an", "of", "in", "on", "for", "to"}
+_QUERY_GROUPING = {"(", ")"}
+
+
+# ======================================================
+# CIRCUIT BREAKER DO REDIS
+# ======================================================
+class RedisUnavailable(redis.ConnectionError):
+    """Circuito aberto: o Redis nem é tentado."""
+
+
+class _RedisBreaker:
+    def __init__(self, threshold: int, cooldown: float, name: str = "cache"):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.name = name
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            # half-open: uma única sonda de cada vez
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"Redis de volta; {self.name} distribuído reativado.")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self, exc):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.threshold:
+                if self._opened_at is None:
+                    logger.warning(
+                        f"Redis indisponível ({exc}); {self.name} em modo local "
+                        f"por {self.cooldown:.0f}s."
+                    )
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        # sonda sem veredito (erro fora do Redis): outra pode tentar
+        with self._lock:
+            self._probing = False
+
+
+class GuardedRedis:
+    """
+    Cliente Redis com timeouts curtos e o seu próprio circuit breaker.
+    `client` é o redis.Redis (pipelines, register_script); as chamadas
+    passam por `call(fn, *args)`, que falha logo com o breaker aberto.
+    """
+
+    def __init__(self, url: str = REDIS_URL, name: str = "cache", **kwargs):
+        self.client = redis.from_url(
+            url,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            **kwargs
+        )
+        self.breaker = _RedisBreaker(REDIS_BREAKER_THRESHOLD, REDIS_BREAKER_COOLDOWN, name)
+
+    def call(self, fn, *args, **kwargs):
+        """Só falhas de ligação contam para o breaker."""
+        if not self.breaker.allow():
+            raise RedisUnavailable("circuit breaker aberto")
+        try:
+            out = fn(*args, **kwargs)
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            self.breaker.failure(e)
+            raise
+        except redis.RedisError:
+            # o Redis respondeu (OOM, WRONGTYPE...): a ligação está boa
+            self.breaker.success()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.success()
+        return out
+
+    @property
+    def available(self) -> bool:
+        return not self.breaker.is_open
+
+
+_CACHE_REDIS = GuardedRedis(REDIS_URL, name="cache")
+r = _CACHE_REDIS.client
+_redis = _CACHE_REDIS.call
+
+
+def get_redis() -> GuardedRedis:
+    """Cliente partilhado do REDIS_URL (e o seu breaker) para outros módulos."""
+    return _CACHE_REDIS
+
+
+def redis_available() -> bool:
+    return _CACHE_REDIS.available
+
+
+# ======================================================
+# TIER LOCAL (LRU + TTL)
+# ======================================================
+def _hard_expiry(envelope: dict) -> float:
+    return envelope["cached_at"] + max(envelope["soft_ttl"], CACHE_HARD_TTL)
+
+
+class _LocalTier:
+    """
+    LRU limitado de envelopes já descodificados (hit sem rede nem parse).
+    Com o Redis saudável cada entrada vale LOCAL_CACHE_TTL s (outros
+    processos podem ter refrescado a query); em modo degradado vale até ao
+    hard TTL do próprio resultado.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, degraded: bool = False):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, envelope = entry
+            if now >= _hard_expiry(envelope):
+                del self._data[key]
+                return None
+            if not degraded and now - stored_at > self.ttl:
+                return None
+            self._data.move_to_end(key)
+            return envelope
+
+    def set(self, key: str, envelope: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time(), envelope)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_LOCAL = _LocalTier(LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_TTL)
+
 
 def get_cache_key(prefix, **kwargs):
     """Gera uma chave única baseada nos argumentos (ex: query='oil')."""
@@ -18,19 +241,451 @@ def get_cache_key(prefix, **kwargs):
     hash_str = hashlib.md5(s.encode('utf-8')).hexdigest()
     return f"horaculo:{prefix}:{hash_str}"
 
-def check_cache(query_text: str):
-    """Verifica se existe uma análise recente (TTL 10 min)."""
-    key = get_cache_key("analysis", q=query_text.lower().strip())
-    data = r.get(key)
+
+def normalize_query(query_text: str) -> str:
+    """
+    'Petroleum,  oil!' -> 'oil petroleum'; 'BTC NOT etf' -> 'btc not etf'.
+    Dobra maiúsculas, espaços, pontuação e a ordem dos termos entre
+    operadores; AND/OR/NOT e parênteses ficam no lugar. Numa cadeia só de
+    AND (ou só de OR), sem parênteses, a ordem dos grupos também não conta.
+    """
+    groups, seps, current = [], [], set()
+    for t in _TOKEN.findall(query_text.lower()):
+        if t in _QUERY_OPERATORS or t in _QUERY_GROUPING:
+            groups.append(" ".join(sorted(current)))
+            seps.append(t)
+            current = set()
+        elif t not in _QUERY_NOISE:
+            current.add(t)
+    groups.append(" ".join(sorted(current)))
+
+    if len(set(seps)) == 1 and seps[0] in ("and", "or") and all(groups):
+        groups.sort()
+    parts = [groups[0]]
+    for sep, group in zip(seps, groups[1:]):
+        parts += [sep, group]
+    return " ".join(p for p in parts if p) or query_text.lower().strip()
+
+
+def _has_query_operators(normalized: str) -> bool:
+    """Query com AND/OR/NOT ou parênteses (já normalizada)."""
+    return any(t in _QUERY_OPERATORS or t in _QUERY_GROUPING for t in normalized.split())
+
+
+def _embed_query(normalized: str):
+    # import tardio: o modelo só carrega se o tier semântico for usado.
+    # Mesmo módulo que o orchestrator: um só encoder por processo.
+    from embeddings import get_embedding
+    return np.asarray(get_embedding(normalized), dtype=np.float32)
+
+
+# ======================================================
+# TIER SEMÂNTICO
+# ======================================================
+def _semantic_lookup(normalized: str, query_embedding=None):
+    metas = _redis(r.hgetall, SEMANTIC_META_KEY)
+    if not metas:
+        return None
+
+    now = time.time()
+    fresh, expired = [], []
+    for field, raw in metas.items():
+        meta = json.loads(raw)
+        (fresh if now - meta["ts"] <= SEMANTIC_CACHE_WINDOW else expired).append((field, meta))
+    if expired:
+        _redis(r.hdel, SEMANTIC_META_KEY, *[f for f, _ in expired])
+        _redis(r.hdel, SEMANTIC_EMB_KEY, *[f for f, _ in expired])
+    if not fresh:
+        return None
+
+    q = query_embedding if query_embedding is not None else _embed_query(normalized)
+    embs = _redis(r.hmget, SEMANTIC_EMB_KEY, [f for f, _ in fresh])
+
+    best, best_sim = None, SEMANTIC_CACHE_THRESHOLD
+    for (field, meta), raw in zip(fresh, embs):
+        if not raw:
+            continue
+        sim = float(np.dot(q, np.frombuffer(raw, dtype=np.float32)))
+        if sim >= best_sim:
+            best, best_sim = meta, sim
+    if best is None:
+        return None
+
+    data = _redis(r.get, best["key"])
+    if not data:
+        return None
+    result = dict(_serve(_decode(data, best["query"])))
+    result["cache_hit"] = {
+        "tier": "semantic",
+        "matched_query": best["query"],
+        "similarity": round(best_sim, 3)
+    }
+    return result
+
+
+def _semantic_register(normalized: str, query_text: str, key: str):
+    emb = _embed_query(normalized)
+    _redis(r.hset, SEMANTIC_EMB_KEY, normalized, emb.tobytes())
+    _redis(r.hset, SEMANTIC_META_KEY, normalized, json.dumps({
+        "query": query_text, "key": key, "ts": time.time()
+    }))
+
+    # limita o índice às entradas mais recentes
+    if _redis(r.hlen, SEMANTIC_META_KEY) > SEMANTIC_CACHE_MAX_ENTRIES:
+        metas = sorted(
+            ((f, json.loads(v)["ts"]) for f, v in _redis(r.hgetall, SEMANTIC_META_KEY).items()),
+            key=lambda x: x[1]
+        )
+        old = [f for f, _ in metas[:-SEMANTIC_CACHE_MAX_ENTRIES]]
+        _redis(r.hdel, SEMANTIC_META_KEY, *old)
+        _redis(r.hdel, SEMANTIC_EMB_KEY, *old)
+
+
+# ======================================================
+# ENVELOPE + REFRESH EM BACKGROUND
+# ======================================================
+_REFRESH_HANDLER = None
+
+
+def register_refresh_handler(handler):
+    """
+    handler(query_text, use_openai) agenda o recálculo (ex.: tarefa Celery).
+    Registado pelo worker; sem handler o stale é servido sem refresh.
+    """
+    global _REFRESH_HANDLER
+    _REFRESH_HANDLER = handler
+
+
+def _encode(query_text: str, result: dict, soft_ttl: int, use_openai: bool) -> bytes:
+    # msgpack/orjson + zstd (ver serialization.py)
+    return serialization.dumps({
+        "cached_at": time.time(),
+        "soft_ttl": soft_ttl,
+        "query": query_text,
+        "use_openai": use_openai,
+        "result": result
+    })
+
+
+def _decode(data, query_text: str = "") -> dict:
+    envelope = serialization.loads(data)
+    if isinstance(envelope, dict) and "cached_at" in envelope and "result" in envelope:
+        return envelope
+    # entrada gravada antes do envelope (resultado cru): idade desconhecida,
+    # serve-se como stale e revalida em background
+    return {
+        "cached_at": time.time(),
+        "soft_ttl": -1,
+        "query": query_text,
+        "use_openai": False,
+        "result": envelope
+    }
+
+
+def schedule_refresh(query_text: str, use_openai: bool = False):
+    """Dispara no máximo um refresh por query enquanto o anterior não expira."""
+    if _REFRESH_HANDLER is None:
+        return False
+    key = get_cache_key("refresh", q=normalize_query(query_text))
+    try:
+        if not _redis(r.set, key, 1, nx=True, ex=SINGLE_FLIGHT_TTL):
+            return False
+    except redis.RedisError:
+        # sem Redis não há broker: o stale continua a ser servido
+        return False
+    try:
+        _REFRESH_HANDLER(query_text, use_openai)
+        logger.info(f"Refresh em background agendado: {query_text}")
+        return True
+    except Exception as e:
+        try:
+            _redis(r.delete, key)
+        except redis.RedisError:
+            pass
+        logger.warning(f"Falha ao agendar refresh de {query_text}: {e}")
+        return False
+
+
+def _serve(envelope: dict) -> dict:
+    # cópia: o envelope pode estar no tier local e o chamador mexe no resultado
+    result = copy.deepcopy(envelope["result"])
+    age = time.time() - envelope["cached_at"]
+    if age <= envelope["soft_ttl"]:
+        return result
+    result["stale"] = True
+    result["cache_age"] = int(age)
+    schedule_refresh(envelope["query"], envelope.get("use_openai", False))
+    return result
+
+
+class _AccessBatch:
+    """
+    Acessos por query somados em memória; uma thread de fundo envia-os ao
+    Redis (ZINCRBY/HSET num pipeline) a cada HOT_ACCESS_FLUSH_SECONDS.
+    check_cache não faz rede para contar. Um lote perdido com o Redis em
+    baixo só atrasa a deteção de queries quentes.
+    """
+
+    def __init__(self):
+        self._counts = {}   # normalizada -> [acessos, texto original]
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def record(self, normalized: str, query_text: str):
+        with self._lock:
+            entry = self._counts.get(normalized)
+            if entry:
+                entry[0] += 1
+            else:
+                self._counts[normalized] = [1, query_text]
+            if self._pid != os.getpid():
+                # threads não sobrevivem ao fork: uma por processo
+                self._pid = os.getpid()
+                threading.Thread(target=self._flush_loop, name="hot-access-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(HOT_ACCESS_FLUSH_SECONDS)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return
+        pipe = r.pipeline(transaction=False)
+        for normalized, (hits, query_text) in counts.items():
+            pipe.zincrby(HOT_KEY, hits, normalized)
+            pipe.hset(HOT_QUERY_KEY, normalized, query_text)
+        try:
+            _redis(pipe.execute)
+        except redis.RedisError as e:
+            logger.debug(f"Contagem de acessos descartada: {e}")
+
+    def reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+
+_ACCESSES = _AccessBatch()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_ACCESSES.reset_after_fork)
+
+
+def refresh_hot_queries(lead_time: float = 0.0):
+    """
+    Refresca as queries mais acedidas que estão (ou vão estar dentro de
+    `lead_time` s) para lá do soft TTL, e decai os contadores para meia-vida
+    de um ciclo. Pensado para correr periodicamente (celery beat).
+    """
+    if not redis_available():
+        return 0
+    hot = _redis(r.zrevrangebyscore, HOT_KEY, "+inf", HOT_QUERY_MIN_HITS, start=0, num=HOT_QUERY_TOP_K)
+    scheduled = 0
+    now = time.time()
+    for normalized in hot:
+        normalized = normalized.decode() if isinstance(normalized, bytes) else normalized
+        query_text = _redis(r.hget, HOT_QUERY_KEY, normalized)
+        query_text = query_text.decode() if query_text else normalized
+        data = _redis(r.get, get_cache_key("analysis", q=normalized))
+        envelope = _decode(data, query_text) if data else None
+        if envelope and now + lead_time - envelope["cached_at"] < envelope["soft_ttl"]:
+            continue
+        if schedule_refresh(query_text, envelope.get("use_openai", False) if envelope else False):
+            scheduled += 1
+
+    # decaimento: contadores valem metade a cada ciclo; some o que ficou frio
+    _redis(r.zunionstore, HOT_KEY, {HOT_KEY: 0.5})
+    cold = _redis(r.zrangebyscore, HOT_KEY, "-inf", 0.5)
+    if cold:
+        _redis(r.zrem, HOT_KEY, *cold)
+        _redis(r.hdel, HOT_QUERY_KEY, *cold)
+    return scheduled
+
+
+# ======================================================
+# API PÚBLICA
+# ======================================================
+def check_cache(query_text: str, query_embedding=None):
+    """
+    Verifica se existe uma análise recente (soft TTL 10 min, stale até ao hard TTL).
+    0) cópia local do processo  1) query normalizada exata no Redis
+    2) query semanticamente próxima (tier 2; só sem operadores).
+    Com o Redis em baixo responde só com o tier local.
+    """
+    normalized = normalize_query(query_text)
+    key = get_cache_key("analysis", q=normalized)
+
+    envelope = _LOCAL.get(key, degraded=not redis_available())
+    _ACCESSES.record(normalized, query_text)
+    if envelope is not None:
+        logger.info(f"CACHE HIT (local) para: {query_text}")
+        return _serve(envelope)
+
+    try:
+        data = _redis(r.get, key)
+    except redis.RedisError as e:
+        logger.debug(f"Cache Redis indisponível: {e}")
+        return None
     if data:
         logger.info(f"CACHE HIT para: {query_text}")
-        return json.loads(data)
+        envelope = _decode(data, query_text)
+        _LOCAL.set(key, envelope)
+        return _serve(envelope)
+
+    # o embedding não vê operadores: "btc not etf" ficaria perto de "btc etf"
+    if SEMANTIC_CACHE_ENABLED and not _has_query_operators(normalized):
+        try:
+            result = _semantic_lookup(normalized, query_embedding)
+        except Exception as e:
+            logger.warning(f"Tier semântico indisponível: {e}")
+            result = None
+        if result:
+            logger.info(
+                f"CACHE HIT semântico para: {query_text} "
+                f"(~ {result['cache_hit']['matched_query']}, {result['cache_hit']['similarity']})"
+            )
+            return result
     return None
 
-def set_cache(query_text: str, result: dict, ttl=600):
-    """Salva o resultado no Redis por 10 minutos (600s)."""
+
+def set_cache(query_text: str, result: dict, ttl=CACHE_SOFT_TTL, use_openai=False):
+    """Salva o resultado: fresco por `ttl` (soft), servido como stale até CACHE_HARD_TTL."""
+    normalized = normalize_query(query_text)
+    key = get_cache_key("analysis", q=normalized)
+    data = _encode(query_text, result, ttl, use_openai)
+    # o tier local guarda o envelope já descodificado (mesmo formato do Redis)
+    _LOCAL.set(key, _decode(data))
     try:
-        key = get_cache_key("analysis", q=query_text.lower().strip())
-        r.setex(key, ttl, json.dumps(result))
+        _redis(r.setex, key, max(ttl, CACHE_HARD_TTL), data)
+        if SEMANTIC_CACHE_ENABLED and not _has_query_operators(normalized):
+            _semantic_register(normalized, query_text, key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache só local (Redis indisponível): {e}")
     except Exception as e:
         logger.error(f"Falha ao salvar cache: {e}")
+
+
+# ======================================================
+# SINGLE-FLIGHT / DEDUPE DE TAREFAS
+# ======================================================
+# DEL só se o valor ainda for o nosso (o lock pode ter expirado e sido
+# apanhado por outro processo entretanto).
+_compare_and_delete = r.register_script("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+""")
+
+
+# EXPIRE só se o valor ainda for o nosso
+_compare_and_expire = r.register_script("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+""")
+
+
+def acquire_flight(query_text: str):
+    """Lock distribuído da análise; devolve um token ou None se outro já corre."""
+    token = uuid.uuid4().hex
+    key = get_cache_key("flight", q=normalize_query(query_text))
+    try:
+        if _redis(r.set, key, token, nx=True, ex=SINGLE_FLIGHT_TTL):
+            return token
+        return None
+    except Exception as e:
+        # sem Redis não há coordenação: cada pedido corre o seu pipeline
+        logger.warning(f"Single-flight indisponível: {e}")
+        return "local"
+
+
+def release_flight(query_text: str, token: str):
+    try:
+        _redis(_compare_and_delete, keys=[get_cache_key("flight", q=normalize_query(query_text))], args=[token])
+    except Exception as e:
+        logger.warning(f"Falha ao libertar single-flight: {e}")
+
+
+def wait_for_flight(query_text: str, timeout: float = SINGLE_FLIGHT_WAIT):
+    """
+    Espera pelo resultado do líder. None se o líder desistiu (lock libertado
+    sem resultado) ou se o tempo acabou.
+    """
+    normalized = normalize_query(query_text)
+    result_key = get_cache_key("analysis", q=normalized)
+    flight_key = get_cache_key("flight", q=normalized)
+    deadline = time.monotonic() + timeout
+    delay = 0.2
+    while time.monotonic() < deadline:
+        try:
+            data = _redis(r.get, result_key)
+            if data:
+                return _decode(data, query_text)["result"]
+            if not _redis(r.exists, flight_key):
+                data = _redis(r.get, result_key)
+                return _decode(data, query_text)["result"] if data else None
+        except redis.RedisError as e:
+            logger.warning(f"Single-flight indisponível durante a espera: {e}")
+            return None
+        time.sleep(delay)
+        delay = min(1.0, delay * 1.5)
+    return None
+
+
+def claim_inflight_task(query_text: str, task_id: str, ttl: int = INFLIGHT_TASK_TTL, **params):
+    """
+    Regista `task_id` como a tarefa em curso para (query, params) por `ttl`
+    segundos (o worker estende com touch_inflight_task ao arrancar).
+    Devolve o id da tarefa já existente, ou None se esta foi registada.
+    """
+    key = get_cache_key("inflight", q=normalize_query(query_text), **params)
+    try:
+        if _redis(r.set, key, task_id, nx=True, ex=max(1, int(ttl))):
+            return None
+        existing = _redis(r.get, key)
+    except redis.RedisError as e:
+        # sem dedupe: a tarefa segue como nova
+        logger.warning(f"Dedupe de tarefas indisponível: {e}")
+        return None
+    return existing.decode() if existing else None
+
+
+def touch_inflight_task(query_text: str, task_id: str, **params):
+    """O worker assumiu a tarefa: o registo passa a valer INFLIGHT_TASK_TTL."""
+    key = get_cache_key("inflight", q=normalize_query(query_text), **params)
+    try:
+        _redis(_compare_and_expire, keys=[key], args=[task_id, INFLIGHT_TASK_TTL])
+    except Exception as e:
+        logger.warning(f"Falha ao estender tarefa em curso: {e}")
+
+
+def clear_inflight_task(query_text: str, task_id: str, **params):
+    key = get_cache_key("inflight", q=normalize_query(query_text), **params)
+    try:
+        _redis(_compare_and_delete, keys=[key], args=[task_id])
+    except Exception as e:
+        logger.warning(f"Falha ao limpar tarefa em curso: {e}")
+
+
+# ======================================================
+# CACHE GENÉRICO (ex.: respostas do LLM)
+# ======================================================
+def get_value(key: str):
+    """Valor guardado com set_value, ou None (inclui Redis indisponível)."""
+    try:
+        data = _redis(r.get, key)
+    except redis.RedisError as e:
+        logger.debug(f"Cache indisponível para {key}: {e}")
+        return None
+    return serialization.loads(data) if data else None
+
+
+def set_value(key: str, value, ttl: int):
+    try:
+        _redis(r.setex, key, ttl, serialization.dumps(value))
+    except redis.RedisError as e:
+        logger.debug(f"Cache indisponível para {key}: {e}")
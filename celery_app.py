@@ -0,0 +1,49 @@
+# python/app/celery_app.py
+# Só a configuração do Celery: a API envia tarefas pelo nome sem importar o
+# worker (e com ele torch, transformers e o orchestrator).
+from celery import Celery
+from kombu import Queue
+import os
+from app.serialization import register_celery_serializer
+
+# Configuração do Celery apontando para o Redis
+celery = Celery("horaculo")
+celery.conf.broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+celery.conf.result_backend = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+
+# Resultados (payloads grandes) em msgpack/orjson + zstd; argumentos em JSON
+celery.conf.result_serializer = register_celery_serializer()
+celery.conf.accept_content = ["json", "horaculo"]
+celery.conf.result_accept_content = ["json", "horaculo"]
+
+# Classes de prioridade: uma fila cada, consumidas por workers separados
+# (docker-compose), para que backfill/refresh nunca atrasem o interativo.
+PRIORITY_CLASSES = ("interactive", "scheduled", "backfill")
+celery.conf.task_queues = [Queue(name) for name in PRIORITY_CLASSES]
+celery.conf.task_default_queue = "interactive"
+celery.conf.task_routes = {
+    "refresh_analysis_task": {"queue": "scheduled"},
+    "refresh_hot_queries_task": {"queue": "scheduled"},
+    "compact_event_history_task": {"queue": "backfill"},
+}
+# Tarefas longas: cada processo reserva só uma, a fila fica visível (LLEN)
+# para a admissão e não se acumula trabalho preso atrás de um pipeline lento.
+celery.conf.worker_prefetch_multiplier = 1
+# ack só no fim: um filho morto (OOM, kill) devolve a tarefa à fila em vez
+# de a deixar PENDING para sempre com o dedupe do /analyze/submit preso nela
+celery.conf.task_acks_late = True
+celery.conf.task_reject_on_worker_lost = True
+
+HOT_REFRESH_INTERVAL = float(os.getenv("HOT_REFRESH_INTERVAL", "120"))
+
+# Manutenção periódica (requer `celery beat`)
+celery.conf.beat_schedule = {
+    "compact-event-history": {
+        "task": "compact_event_history_task",
+        "schedule": float(os.getenv("EVENT_COMPACTION_INTERVAL", 6 * 3600)),
+    },
+    "refresh-hot-queries": {
+        "task": "refresh_hot_queries_task",
+        "schedule": HOT_REFRESH_INTERVAL,
+    },
+}
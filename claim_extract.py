@@ -1,20 +1,12 @@
 # python/app/claim_extract.py
-import re
 from typing import List
 
+from app.textprep import prepare, prepare_batch
+
 def extract_claim(text: str) -> str:
-    # heuristics: take first sentence or clause with verbs like "will", "to", "says", "announces"
-    s = text.strip()
-    if not s: return ""
-    # split by punctuation
-    parts = re.split(r'\.|\!|\?', s)
-    if parts:
-        first = parts[0].strip()
-        if len(first.split()) < 6 and len(parts) > 1:
-            # try second
-            return parts[1].strip()[:300]
-        return first[:300]
-    return s[:300]
+    # heuristics: first sentence, or the second when the first is a short headline/dateline
+    # (single pass shared with token_sieve / extract_hard_data, see textprep.py)
+    return prepare(text).claim
 
 def batch_extract_claims(texts: List[str]):
-    return [extract_claim(t) for t in texts]
+    return [p.claim for p in prepare_batch(texts)]
@@ -1,22 +1,20 @@
 # python/app/variants/crypto.py
-import feedparser
 import asyncio
-import httpx
 import logging
 from typing import List, Dict
 
 # Importações do Core do Horaculo
 import core  # O motor C++
-from app.embeddings import get_embedding #
-from app.sentiment import batch_sentiment_score #
 from app.data_extractor import extract_hard_data #
+from app.http_pool import run_sync
+from app.ingest import fetch_feeds
 
 logger = logging.getLogger("horaculo.crypto")
 
 class CryptoSatellite:
     def __init__(self):
         # Threshold ajustado para 0.82 para capturar gírias de cripto
-        # O Motor C++ é instanciado aqui de forma isolada
+        # O Motor C++ é instanciado uma vez por processo (ver get_satellite)
         self.engine = core.HoraculoEngine(copy_threshold=0.82)
         
         # Fontes de Elite (RSS Público)
@@ -29,24 +27,19 @@ class CryptoSatellite:
         ]
 
     async def _fetch_rss(self, asset: str) -> List[Dict]:
-        """Busca assíncrona de sinais em feeds RSS."""
+        """Busca assíncrona de sinais: feeds em paralelo, com cache condicional."""
         signals = []
-        async with httpx.AsyncClient() as client:
-            for url in self.feeds:
-                try:
-                    resp = await client.get(url, timeout=8.0)
-                    feed = feedparser.parse(resp.text)
-                    for entry in feed.entries[:10]: # Top 10 mais recentes
-                        # Filtro insensível a maiúsculas
-                        if asset.lower() in entry.title.lower() or asset.lower() in entry.summary.lower():
-                            signals.append({
-                                "source": feed.feed.title if hasattr(feed.feed, 'title') else "Crypto Source",
-                                "text": f"{entry.title}. {entry.summary[:300]}",
-                                "url": entry.link,
-                                "published": entry.get("published", "")
-                            })
-                except Exception as e:
-                    logger.warning(f"Falha ao ler feed {url}: {e}")
+        needle = asset.lower()
+        for entries in await fetch_feeds(self.feeds, 10): # Top 10 mais recentes
+            for entry in entries:
+                # Filtro insensível a maiúsculas
+                if needle in entry["title"].lower() or needle in entry["description"].lower():
+                    signals.append({
+                        "source": entry["source"] or "Crypto Source",
+                        "text": f"{entry['title']}. {entry['description'][:300]}",
+                        "url": entry["url"],
+                        "published": entry.get("publishedAt") or ""
+                    })
         return signals
 
     def _get_action_signal(self, conflict: float, sentiment: float, is_panic: bool) -> Dict:
@@ -69,27 +62,28 @@ class CryptoSatellite:
         # 4. INCERTO (Escudo) - Conflito moderado ou Sentimento Neutro
         return {"code": "HODL / WAIT", "color": "#A855F7", "icon": "shield"} # Purple-500
 
-    def run_analysis(self, asset: str):
-        # 1. Busca de Sinais
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        raw_signals = loop.run_until_complete(self._fetch_rss(asset))
+    def _no_data(self, asset: str) -> Dict:
+        return {
+            "status": "no_data", 
+            "asset": asset,
+            "action_signal": {"code": "NO SIGNAL", "color": "#64748B", "icon": "cloud-off"}
+        }
 
-        if not raw_signals:
-            return {
-                "status": "no_data", 
-                "asset": asset,
-                "action_signal": {"code": "NO SIGNAL", "color": "#64748B", "icon": "cloud-off"}
-            }
+    def _score(self, asset: str, raw_signals: List[Dict]) -> Dict:
+        """Parte CPU/GPU da análise (corre fora do event loop da API)."""
+        # import tardio: torch/transformers só entram no processo da API
+        # no primeiro pedido cripto (ou no warmup)
+        from app.embeddings import embed_texts
+        from app.sentiment import batch_sentiment_score
 
-        # 2. Processamento Vetorial
+        # 2. Processamento Vetorial (em lote)
         texts = [s['text'] for s in raw_signals]
-        embeddings = [get_embedding(t) for t in texts]
+        embeddings = embed_texts(texts)
         sentiments = batch_sentiment_score(texts)
 
-        # 3. Arbitragem C++ (Core Engine)
+        # 3. Arbitragem C++ (Core Engine) — liberta o GIL, seguro entre threads
         # Compara narrativa contra narrativa para ver quem está mentindo
-        verdicts = self.engine.analyze_batch(embeddings, embeddings, [s['source'] for s in raw_signals])
+        verdicts = self.engine.analyze_batch(embeddings, [s['source'] for s in raw_signals])
         
         # 4. Cálculo de Métricas
         max_conflict = max([v.intensity for v in verdicts]) if verdicts else 0.0
@@ -114,3 +108,35 @@ class CryptoSatellite:
             "hard_data": hard_data,
             "signals": raw_signals[:8] # Retorna as 8 notícias mais relevantes
         }
+
+    def warmup(self):
+        """Carrega encoder e FinBERT antes do primeiro pedido."""
+        from app.embeddings import load_model
+        from app.sentiment import get_pipeline
+        load_model()
+        get_pipeline()
+
+    async def run_analysis_async(self, asset: str) -> Dict:
+        """Caminho da API: I/O no loop, scoring numa thread."""
+        raw_signals = await self._fetch_rss(asset)
+        if not raw_signals:
+            return self._no_data(asset)
+        return await asyncio.to_thread(self._score, asset, raw_signals)
+
+    def run_analysis(self, asset: str):
+        # 1. Busca de Sinais
+        raw_signals = run_sync(self._fetch_rss(asset))
+        if not raw_signals:
+            return self._no_data(asset)
+        return self._score(asset, raw_signals)
+
+
+# Um satélite por processo: motor C++ e modelos carregados uma vez
+_SATELLITE = None
+
+
+def get_satellite() -> CryptoSatellite:
+    global _SATELLITE
+    if _SATELLITE is None:
+        _SATELLITE = CryptoSatellite()
+    return _SATELLITE
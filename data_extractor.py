@@ -1,33 +1,25 @@
 # python/app/data_extractor.py
-import re
+from app.textprep import prepare_batch
 
 def extract_hard_data(texts):
     """
     Varre uma lista de textos em busca de factos numéricos: 
     Percentagens, Valores Monetários e Datas.
+    Os factos vêm da normalização por texto (textprep, cacheada), por isso
+    textos já vistos por extract_claim / token_sieve não são re-varridos.
     """
-    # Regex para capturar: 10%, +5.4%, -0.2pp
-    pct_pattern = r'([+-]?\d+(?:\.\d+)?\s?%)'
-    # Regex para capturar: $100M, €1.5bn, USD 50k
-    val_pattern = r'([$€£]|USD|EUR|BRL)\s?\d+(?:\.\d+)?\s?(?:M|bn|k|milhões|bilhões)?'
+    prepared = prepare_batch(texts)
     
-    extracted = {
-        "percentages": [],
-        "monetary": [],
-        "key_numbers": []
-    }
-    
-    combined_text = " ".join(texts)
-    
-    # Extração
-    extracted["percentages"] = list(set(re.findall(pct_pattern, combined_text)))
-    extracted["monetary"] = list(set(re.findall(val_pattern, combined_text)))
+    # únicos, pela ordem em que aparecem
+    percentages = dict.fromkeys(v for p in prepared for v in p.percentages)
+    monetary = dict.fromkeys(v for p in prepared for v in p.monetary)
     
     # Limitar para não poluir o prompt (top 10 de cada)
-    extracted["percentages"] = extracted["percentages"][:10]
-    extracted["monetary"] = extracted["monetary"][:10]
-    
-    return extracted
+    return {
+        "percentages": list(percentages)[:10],
+        "monetary": list(monetary)[:10],
+        "key_numbers": []
+    }
 
 def format_data_for_prompt(data_dict):
     """Transforma o dicionário numa string legível para o LLM."""
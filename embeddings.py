@@ -2,23 +2,24 @@
 
 import hashlib
 import json
+import logging
 import redis
 from sentence_transformers import SentenceTransformer
 
+from app.cache import REDIS_URL, GuardedRedis
+
+logger = logging.getLogger("horaculo.embeddings")
+
 # ----------------------------
 # CONFIG REDIS
 # ----------------------------
-REDIS_HOST = "localhost"
-REDIS_PORT = 6379
-REDIS_DB = 0
+# Mesmo Redis do cache (REDIS_URL), com cliente e breaker próprios: com o
+# Redis em baixo falha depressa sem abrir o breaker do cache de análises.
 REDIS_TTL = 60 * 60 * 24 * 7  # 7 dias
 
-_rds = redis.Redis(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    db=REDIS_DB,
-    decode_responses=True
-)
+_EMB_REDIS = GuardedRedis(REDIS_URL, name="cache de embeddings", decode_responses=True)
+_rds = _EMB_REDIS.client
+_redis = _EMB_REDIS.call
 
 # ----------------------------
 # MODEL SINGLETON
@@ -42,8 +43,12 @@ def get_embedding(text: str):
     text_hash = hashlib.md5(text.encode("utf-8")).hexdigest()
     key = f"emb:{text_hash}"
 
-    # 1️⃣ Cache
-    cached = _rds.get(key)
+    # 1️⃣ Cache (sem Redis calcula-se na mesma)
+    try:
+        cached = _redis(_rds.get, key)
+    except redis.RedisError as e:
+        logger.debug(f"Cache de embeddings indisponível: {e}")
+        cached = None
     if cached:
         return json.loads(cached)
 
@@ -58,13 +63,53 @@ def get_embedding(text: str):
     emb_list = emb.tolist()
 
     # 3️⃣ Salva no Redis
-    _rds.setex(key, REDIS_TTL, json.dumps(emb_list))
+    try:
+        _redis(_rds.setex, key, REDIS_TTL, json.dumps(emb_list))
+    except redis.RedisError as e:
+        logger.debug(f"Cache de embeddings indisponível: {e}")
 
     return emb_list
 
 
-def embed_texts(texts):
+def embed_texts(texts, batch_size=32):
     """
-    Versão em lote usando cache individual.
+    Versão em lote: um MGET no Redis e um único encode para os misses.
     """
-    return [get_embedding(t) for t in texts]
+    if not texts:
+        return []
+
+    clean = [t.strip() for t in texts]
+    keys = [f"emb:{hashlib.md5(t.encode('utf-8')).hexdigest()}" for t in clean]
+
+    # 1️⃣ Cache (sem Redis calcula-se tudo)
+    try:
+        cached = _redis(_rds.mget, keys)
+    except redis.RedisError as e:
+        logger.debug(f"Cache de embeddings indisponível: {e}")
+        cached = [None] * len(keys)
+    results = [json.loads(c) if c else None for c in cached]
+
+    # 2️⃣ GPU (caro) — só textos únicos em falta
+    missing = list(dict.fromkeys(clean[i] for i, r in enumerate(results) if r is None))
+    if missing:
+        model = load_model()
+        encoded = model.encode(
+            missing,
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        fresh = {t: e.tolist() for t, e in zip(missing, encoded)}
+
+        # 3️⃣ Salva no Redis
+        pipe = _rds.pipeline(transaction=False)
+        for t, emb in fresh.items():
+            pipe.setex(f"emb:{hashlib.md5(t.encode('utf-8')).hexdigest()}", REDIS_TTL, json.dumps(emb))
+        try:
+            _redis(pipe.execute)
+        except redis.RedisError as e:
+            logger.debug(f"Cache de embeddings indisponível: {e}")
+
+        results = [r if r is not None else fresh[clean[i]] for i, r in enumerate(results)]
+
+    return results
@@ -0,0 +1,188 @@
+# python/app/http_pool.py
+import os
+import atexit
+import asyncio
+import logging
+import threading
+import httpx
+
+logger = logging.getLogger("horaculo.http_pool")
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+# ======================================================
+# CONFIG
+# ======================================================
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1" and HAS_H2
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "6"))
+# Overrides por host: "newsapi.org=2,feeds.bloomberg.com=4"
+HTTP_HOST_LIMITS = {
+    host.strip(): int(limit)
+    for host, limit in (
+        pair.split("=", 1)
+        for pair in os.getenv("HTTP_HOST_LIMITS", "").split(",") if "=" in pair
+    )
+}
+
+
+# ======================================================
+# LIMITE POR HOST
+# ======================================================
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Liberta o slot do host só quando o corpo da resposta é fechado."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class PerHostLimitTransport(httpx.AsyncBaseTransport):
+    """Transport httpx com semáforo por host sobre o pool partilhado."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+        self._semaphores = {}
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(host)
+        if sem is None:
+            sem = self._semaphores[host] = asyncio.Semaphore(
+                HTTP_HOST_LIMITS.get(host, HTTP_PER_HOST_LIMIT)
+            )
+        return sem
+
+    async def handle_async_request(self, request):
+        sem = self._semaphore(request.url.host)
+        await sem.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                sem.release()
+
+        try:
+            response = await self._inner.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+# ======================================================
+# CLIENTE POR EVENT LOOP
+# ======================================================
+# Um httpx.AsyncClient está preso ao loop onde abriu as conexões: guardamos
+# um por loop (o loop de fundo deste processo, o do uvicorn, ...).
+_CLIENTS = {}
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+    transport = PerHostLimitTransport(
+        httpx.AsyncHTTPTransport(http2=HTTP2_ENABLED, limits=limits, retries=1)
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(10.0, connect=5.0),
+        follow_redirects=True,
+        headers={"User-Agent": "Horaculo/2.0"}
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """Cliente pooled (keep-alive, HTTP/2 se disponível) do loop corrente."""
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        client = _CLIENTS[loop] = _build_client()
+        logger.info(f"Cliente HTTP pooled criado (http2={HTTP2_ENABLED}).")
+    return client
+
+
+# ======================================================
+# EVENT LOOP DE FUNDO (ENTRYPOINTS SÍNCRONOS)
+# ======================================================
+# Celery / CLI são síncronos: em vez de asyncio.run() por query (loop novo,
+# conexões frias), submetem corrotinas a um loop persistente numa thread.
+_LOOP = None
+_LOOP_LOCK = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever,
+                name="horaculo-io-loop",
+                daemon=True
+            ).start()
+            _LOOP = loop
+    return _LOOP
+
+
+def run_sync(coro, timeout=None):
+    """Executa `coro` no loop de fundo do processo e espera o resultado."""
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_sync chamado de dentro do loop de I/O; use await.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+def _shutdown():
+    loop = _LOOP
+    if loop is None or loop.is_closed():
+        return
+    client = _CLIENTS.pop(loop, None)
+    if client is not None:
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(5)
+        except Exception:
+            pass
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def _reset_after_fork():
+    # A thread do loop não sobrevive ao fork (prefork do Celery): o filho
+    # recria loop e conexões no primeiro uso.
+    global _LOOP, _LOOP_LOCK
+    _LOOP = None
+    _LOOP_LOCK = threading.Lock()
+    _CLIENTS.clear()
+
+
+atexit.register(_shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,14 +1,85 @@
 # python/app/ingest.py
-import httpx
+import os
+import time
 import feedparser
 import asyncio
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import List
 
+from app.http_pool import get_client, run_sync
+
 logger = logging.getLogger("horaculo.ingest")
 
 NEWSAPI_URL = "https://newsapi.org/v2/everything"
 
+# ======================================================
+# ESTATÍSTICAS POR FONTE (LATÊNCIA / YIELD)
+# ======================================================
+INGEST_DEADLINE_SECONDS = float(os.getenv("INGEST_DEADLINE_SECONDS", "4.0"))
+# hedge antes de ter amostras suficientes
+HEDGE_DEFAULT_SECONDS = float(os.getenv("HEDGE_DEFAULT_SECONDS", "1.5"))
+_EWMA_ALPHA = 0.2
+
+
+class FeedStats:
+    """EWMA de latência (+ desvio) e de itens devolvidos por fonte."""
+
+    __slots__ = ("latency", "deviation", "yield_", "samples")
+
+    def __init__(self):
+        self.latency = None
+        self.deviation = 0.0
+        self.yield_ = None
+        self.samples = 0
+
+    def observe(self, latency: float, n_items: int):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.deviation += _EWMA_ALPHA * (abs(latency - self.latency) - self.deviation)
+            self.latency += _EWMA_ALPHA * (latency - self.latency)
+        if self.yield_ is None:
+            self.yield_ = float(n_items)
+        else:
+            self.yield_ += _EWMA_ALPHA * (n_items - self.yield_)
+        self.samples += 1
+
+    def observe_cancelled(self, elapsed: float):
+        """
+        Tentativa cancelada (hedge perdido, deadline): só se sabe que a
+        latência foi >= elapsed. Conta para a latência, não para o yield;
+        sem isto o EWMA e o p95 só veriam as respostas rápidas.
+        """
+        if self.latency is None:
+            self.latency = elapsed
+        elif elapsed > self.latency:
+            self.deviation += _EWMA_ALPHA * (elapsed - self.latency - self.deviation)
+            self.latency += _EWMA_ALPHA * (elapsed - self.latency)
+        self.samples += 1
+
+    def hedge_after(self) -> float:
+        """~p95 da latência: passado isto, vale a pena duplicar o pedido."""
+        if self.samples < 3:
+            return HEDGE_DEFAULT_SECONDS
+        return self.latency + 2 * self.deviation
+
+    def expected_latency(self) -> float:
+        return HEDGE_DEFAULT_SECONDS if self.latency is None else self.latency
+
+
+_FEED_STATS = {}
+
+
+def get_feed_stats(name: str) -> FeedStats:
+    stats = _FEED_STATS.get(name)
+    if stats is None:
+        stats = _FEED_STATS[name] = FeedStats()
+    return stats
+
+
 # ======================================================
 # FETCHERS
 # ======================================================
@@ -21,10 +92,12 @@ async def _fetch_newsapi_async(client, query, api_key, page_size):
     }
     headers = {"Authorization": api_key}
 
+    started = time.monotonic()
     try:
         resp = await client.get(NEWSAPI_URL, params=params, headers=headers, timeout=10)
         resp.raise_for_status()
         data = resp.json()
+        get_feed_stats("newsapi").observe(time.monotonic() - started, len(data.get("articles", [])))
         return [
             {
                 "source": a["source"]["name"] or "unknown",
@@ -37,30 +110,140 @@ async def _fetch_newsapi_async(client, query, api_key, page_size):
             for a in data.get("articles", [])
         ]
     except Exception as e:
+        get_feed_stats("newsapi").observe(time.monotonic() - started, 0)
         logger.warning(f"NewsAPI falhou: {e}")
         return []
+    except asyncio.CancelledError:
+        get_feed_stats("newsapi").observe_cancelled(time.monotonic() - started)
+        raise
+
+
+# ======================================================
+# FEED CACHE (CONDITIONAL GET)
+# ======================================================
+# Por URL: validadores HTTP + entradas já parseadas. Dentro do intervalo
+# mínimo nem vai à rede; depois disso envia If-None-Match/If-Modified-Since
+# e reaproveita o parse num 304.
+FEED_MIN_REFRESH_SECONDS = float(os.getenv("FEED_MIN_REFRESH_SECONDS", "60"))
+
+_FEED_CACHE = {}
+
+# ======================================================
+# PARSE FORA DO EVENT LOOP
+# ======================================================
+# feedparser é CPU puro (e segura o GIL). O paralelismo real está no
+# poller (poller.py), processo normal com ProcessPool: é ele que lê todos os
+# feeds. Os filhos prefork do Celery são daemon e não podem ter filhos; aí o
+# parse vai para um único thread, que não corre em paralelo com nada: só
+# parte o trabalho em fatias (troca de GIL a cada 5 ms) para o loop continuar
+# a servir os outros fetches. Medido com bench_feedparse.py (feed de 50
+# itens ~13 ms; 6 feeds): o tempo total é igual ao do parse no próprio loop
+# e a maior paragem do loop desce de ~35 ms para ~15-25 ms (~4 ms com
+# processos).
+FEED_PARSE_WORKERS = int(os.getenv("FEED_PARSE_WORKERS", "2"))
+# O processo que cria o pool já tem threads (loop de I/O do http_pool,
+# logging): fork copiaria locks tomados. forkserver/spawn partem de limpo.
+FEED_PARSE_START_METHOD = os.getenv("FEED_PARSE_START_METHOD", "forkserver")
+# Só guardamos/transferimos as N entradas mais recentes de cada feed
+FEED_MAX_ENTRIES = int(os.getenv("FEED_MAX_ENTRIES", "50"))
+
+_PARSE_POOL = None
+
+
+def _get_parse_pool():
+    global _PARSE_POOL
+    if _PARSE_POOL is None:
+        if FEED_PARSE_WORKERS > 0 and not multiprocessing.current_process().daemon:
+            method = FEED_PARSE_START_METHOD
+            if method not in multiprocessing.get_all_start_methods():
+                method = "spawn"
+            _PARSE_POOL = ProcessPoolExecutor(
+                max_workers=FEED_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context(method)
+            )
+        else:
+            # mais threads só disputariam o GIL (ver acima)
+            _PARSE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feedparse")
+    return _PARSE_POOL
+
+
+def _parse_feed_items(content, max_entries=FEED_MAX_ENTRIES):
+    feed = feedparser.parse(content)
+    source = feed.feed.get("title", "rss")
+    return [
+        {
+            "source": source,
+            "title": e.get("title", ""),
+            "description": e.get("summary", ""),
+            "text": f"{e.get('title','')} . {e.get('summary','')}",
+            "url": e.get("link", ""),
+            "publishedAt": e.get("published")
+        }
+        for e in feed.entries[:max_entries]
+    ]
+
+
+async def _parse_feed_async(content):
+    global _PARSE_POOL
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_parse_pool(), _parse_feed_items, content)
+    except BrokenProcessPool:
+        logger.warning("Pool de parse quebrado; a usar threads.")
+        _PARSE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feedparse")
+        return await loop.run_in_executor(_PARSE_POOL, _parse_feed_items, content)
+
+
+def _cached_items(items, limit):
+    # cópias: quem consome (dedupe, relevance) muta os dicts
+    return [dict(i) for i in items[:limit]]
 
 
-async def _fetch_rss_async(client, url, limit):
+async def _fetch_rss_async(client, url, limit, min_refresh=None):
+    min_refresh = FEED_MIN_REFRESH_SECONDS if min_refresh is None else min_refresh
+    cached = _FEED_CACHE.get(url)
+    now = time.monotonic()
+
+    if cached and now - cached["checked_at"] < min_refresh:
+        return _cached_items(cached["items"], limit)
+
+    headers = {}
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
     try:
-        resp = await client.get(url, timeout=10)
+        resp = await client.get(url, headers=headers, timeout=10)
+
+        if resp.status_code == 304 and cached:
+            cached["checked_at"] = now
+            get_feed_stats(url).observe(time.monotonic() - now, len(cached["items"]))
+            logger.debug(f"RSS 304 ({url}): reutilizando parse em cache")
+            return _cached_items(cached["items"], limit)
+
         resp.raise_for_status()
-        feed = feedparser.parse(resp.text)
+        # bytes crus: o feedparser deteta o encoding sem decode prévio
+        items = await _parse_feed_async(resp.content)
+        get_feed_stats(url).observe(time.monotonic() - now, len(items))
 
-        return [
-            {
-                "source": feed.feed.get("title", "rss"),
-                "title": e.get("title", ""),
-                "description": e.get("summary", ""),
-                "text": f"{e.get('title','')} . {e.get('summary','')}",
-                "url": e.get("link", ""),
-                "publishedAt": e.get("published")
-            }
-            for e in feed.entries[:limit]
-        ]
+        _FEED_CACHE[url] = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "items": items,
+            "checked_at": now
+        }
+        return _cached_items(items, limit)
     except Exception as e:
+        get_feed_stats(url).observe(time.monotonic() - now, 0)
         logger.warning(f"RSS falhou ({url}): {e}")
-        return []
+        # feed em baixo: melhor a última versão conhecida do que nada
+        return _cached_items(cached["items"], limit) if cached else []
+    except asyncio.CancelledError:
+        # hedge perdido ou descartado no deadline
+        get_feed_stats(url).observe_cancelled(time.monotonic() - now)
+        raise
 
 
 # ======================================================
@@ -80,87 +263,178 @@ def estimate_confidence(results: List[dict]) -> float:
 
 
 # ======================================================
-# INGESTÃO EM TIERS (FAIL-FAST)
+# HEDGING
 # ======================================================
-async def fetch_all_sources(query, api_key):
-    tier1_rss = [
-        "https://www.reuters.com/rssFeed/businessNews",
-        "https://feeds.bloomberg.com/markets/news.rss"
-    ]
+async def _hedged_fetch(name, factory, delay, deadline_at, skip_if=None):
+    """
+    Arranca após `delay`; se passar do p95 da fonte sem resposta e ainda
+    houver tempo, dispara um segundo pedido e fica com o primeiro não-vazio.
+    """
+    if delay > 0:
+        await asyncio.sleep(delay)
+        if skip_if and skip_if():
+            return []
 
-    tier2_rss = [
-        # exemplos
-        "https://finance.yahoo.com/rss",
-        "https://www.investing.com/rss/news.rss"
-    ]
+    stats = get_feed_stats(name)
+    attempts = {asyncio.create_task(factory())}
+    hedged = False
+    try:
+        while attempts:
+            done, attempts = await asyncio.wait(
+                attempts,
+                timeout=None if hedged else stats.hedge_after(),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.result():
+                    return task.result()
+            remaining = deadline_at - time.monotonic()
+            if not hedged and attempts and remaining > stats.expected_latency():
+                logger.debug(f"Hedge em {name} ({stats.hedge_after():.2f}s sem resposta)")
+                attempts.add(asyncio.create_task(factory()))
+            hedged = True
+        return []
+    finally:
+        for task in attempts:
+            task.cancel()
 
-    async with httpx.AsyncClient() as client:
 
-        # -------------------------
-        # TIER 1
-        # -------------------------
-        tier1_tasks = []
+# ======================================================
+# INGESTÃO EM TIERS (ADAPTATIVA, COM DEADLINE)
+# ======================================================
+TIER1_RSS = [
+    "https://www.reuters.com/rssFeed/businessNews",
+    "https://feeds.bloomberg.com/markets/news.rss"
+]
 
-        if api_key:
-            tier1_tasks.append(
-                asyncio.create_task(
-                    _fetch_newsapi_async(client, query, api_key, 30)
-                )
-            )
+TIER2_RSS = [
+    # exemplos
+    "https://finance.yahoo.com/rss",
+    "https://www.investing.com/rss/news.rss"
+]
 
-        for url in tier1_rss:
-            tier1_tasks.append(
-                asyncio.create_task(
-                    _fetch_rss_async(client, url, 10)
-                )
-            )
 
-        done, pending = await asyncio.wait(
-            tier1_tasks,
-            timeout=2,
-            return_when=asyncio.FIRST_COMPLETED
-        )
+async def fetch_all_sources(query, api_key, deadline=None):
+    """
+    Todas as fontes correm em paralelo sob um deadline por query.
+    - Tier 1 arranca já; Tier 2 com yield histórico >= média do Tier 1 também.
+    - O resto do Tier 2 é escalonado para quando o Tier 1 costuma responder,
+      e é dispensado se nessa altura o Tier 1 já deu confiança suficiente.
+    - Pedidos lentos (acima do p95 da fonte) são duplicados (hedge).
+    Tudo o que chegar antes do deadline é aproveitado.
+    """
+    deadline = INGEST_DEADLINE_SECONDS if deadline is None else deadline
+    deadline_at = time.monotonic() + deadline
 
-        tier1_results = []
-        for task in done:
-            tier1_results.extend(task.result())
+    client = get_client()
+    tier1 = [
+        (url, lambda url=url: _fetch_rss_async(client, url, 10))
+        for url in TIER1_RSS
+    ]
+    if api_key:
+        tier1.insert(0, (
+            "newsapi",
+            lambda: _fetch_newsapi_async(client, query, api_key, 30)
+        ))
+    tier2 = [
+        (url, lambda url=url: _fetch_rss_async(client, url, 10))
+        for url in TIER2_RSS
+    ]
 
-        confidence = estimate_confidence(tier1_results)
+    tier1_stats = [get_feed_stats(name) for name, _ in tier1]
+    tier1_yield = [s.yield_ for s in tier1_stats if s.yield_ is not None]
+    avg_tier1_yield = sum(tier1_yield) / len(tier1_yield) if tier1_yield else 0.0
+    tier2_delay = min(
+        deadline / 2,
+        max((s.expected_latency() for s in tier1_stats), default=0.0)
+    )
 
-        if tier1_results and confidence >= 0.9:
-            # FAIL-FAST: cancela o resto
-            for task in pending:
-                task.cancel()
+    tier1_tasks = [
+        asyncio.create_task(_hedged_fetch(name, factory, 0.0, deadline_at))
+        for name, factory in tier1
+    ]
 
-            logger.info("Tier 1 suficiente. Abortando Tier 2.")
-            return tier1_results
+    def tier1_sufficient():
+        results = [
+            item
+            for t in tier1_tasks if t.done() and not t.cancelled()
+            for item in t.result()
+        ]
+        return bool(results) and estimate_confidence(results) >= 0.9
 
-        # -------------------------
-        # TIER 2
-        # -------------------------
-        logger.info("Tier 1 insuficiente. Ativando Tier 2.")
+    tier2_tasks = []
+    for name, factory in tier2:
+        stats = get_feed_stats(name)
+        valuable = stats.yield_ is not None and stats.yield_ >= avg_tier1_yield
+        tier2_tasks.append(asyncio.create_task(_hedged_fetch(
+            name, factory,
+            0.0 if valuable else tier2_delay,
+            deadline_at,
+            skip_if=tier1_sufficient
+        )))
+
+    all_tasks = tier1_tasks + tier2_tasks
+    _, pending = await asyncio.wait(
+        all_tasks, timeout=max(0.0, deadline_at - time.monotonic())
+    )
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.info(f"Deadline de ingestão ({deadline:.1f}s): {len(pending)} fontes descartadas.")
+
+    results = []
+    for task in all_tasks:
+        if task.done() and not task.cancelled() and task.exception() is None:
+            results.extend(task.result())
+    return results
 
-        tier2_tasks = [
-            asyncio.create_task(_fetch_rss_async(client, url, 10))
-            for url in tier2_rss
-        ]
 
-        tier2_results = []
-        if tier2_tasks:
-            results = await asyncio.gather(*tier2_tasks, return_exceptions=True)
-            for r in results:
-                if isinstance(r, list):
-                    tier2_results.extend(r)
+# ======================================================
+# FEEDS AVULSOS (SATÉLITES)
+# ======================================================
+async def fetch_feeds(urls, limit=10):
+    """Vários feeds RSS em paralelo, com cache condicional e parse fora do loop."""
+    client = get_client()
+    results = await asyncio.gather(
+        *(_fetch_rss_async(client, url, limit) for url in urls),
+        return_exceptions=True
+    )
+    return [r if isinstance(r, list) else [] for r in results]
+
+
+# ======================================================
+# POLLING (ALIMENTA A ARTICLE STORE)
+# ======================================================
+async def poll_sources(api_key=None, newsapi_queries=(), limit=50):
+    """
+    Lê todos os feeds configurados (Tier 1 + Tier 2) e, com chave,
+    as queries permanentes da NewsAPI. Sem fail-fast: o poller quer tudo.
+    """
+    client = get_client()
+    tasks = [
+        _fetch_rss_async(client, url, limit)
+        for url in TIER1_RSS + TIER2_RSS
+    ]
+    if api_key:
+        tasks += [
+            _fetch_newsapi_async(client, q, api_key, limit)
+            for q in newsapi_queries
+        ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        return tier1_results + tier2_results
+    items = []
+    for r in results:
+        if isinstance(r, list):
+            items.extend(r)
+    return items
 
 
 # ======================================================
 # SYNC ENTRYPOINT (CELERY / FASTAPI)
 # ======================================================
-def fetch_data_entrypoint(query, api_key):
+def fetch_data_entrypoint(query, api_key, deadline=None):
     try:
-        return asyncio.run(fetch_all_sources(query, api_key))
+        return run_sync(fetch_all_sources(query, api_key, deadline=deadline))
     except Exception as e:
         logger.error(f"Falha crítica no ingest: {e}")
         return []
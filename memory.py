@@ -1,10 +1,17 @@
 # python/app/memory.py
 import os
+import re
 import json
 import time
+import datetime
 import logging
 import sqlite3
 import psycopg2
+import psycopg2.errors
+import numpy as np
+from collections import deque
+
+from vector_memory import get_event_index
 
 logger = logging.getLogger("horaculo.memory")
 
@@ -34,6 +41,65 @@ def get_db_connection():
         return conn
 
 
+# =========================
+# PARTIÇÕES (POSTGRES)
+# =========================
+
+_PG_PARTITIONED = False
+_PARTITIONS_READY = set()
+# partições mensais pré-criadas pela compactação (beat)
+EVENT_PARTITIONS_AHEAD = int(os.getenv("EVENT_PARTITIONS_AHEAD", "2"))
+
+
+def _month_bounds(ts: int):
+    """[início, fim) do mês UTC que contém `ts`, em epoch segundos."""
+    d = datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc)
+    start = datetime.datetime(d.year, d.month, 1, tzinfo=datetime.timezone.utc)
+    end = datetime.datetime(
+        d.year + (d.month == 12), d.month % 12 + 1, 1,
+        tzinfo=datetime.timezone.utc
+    )
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def _pg_is_partitioned(cur) -> bool:
+    cur.execute("SELECT relkind FROM pg_class WHERE relname = 'event_history'")
+    row = cur.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def _ensure_month_partition(cur, ts: int):
+    """Cria event_history_YYYYMM para o mês de `ts` (idempotente, cache em processo)."""
+    start, end = _month_bounds(ts)
+    if start in _PARTITIONS_READY:
+        return
+    name = "event_history_" + datetime.datetime.fromtimestamp(
+        start, tz=datetime.timezone.utc
+    ).strftime("%Y%m")
+    # IF NOT EXISTS não basta entre transações concorrentes (filhos do
+    # prefork na virada do mês): o perdedor falha com unique violation em
+    # pg_type. O savepoint isola a falha da transação do chamador.
+    cur.execute("SAVEPOINT ensure_partition")
+    try:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name}
+            PARTITION OF event_history
+            FOR VALUES FROM ({start}) TO ({end})
+        """)
+    except (psycopg2.errors.DuplicateTable, psycopg2.errors.UniqueViolation):
+        cur.execute("ROLLBACK TO SAVEPOINT ensure_partition")
+    cur.execute("RELEASE SAVEPOINT ensure_partition")
+    _PARTITIONS_READY.add(start)
+
+
+def _ensure_upcoming_partitions(cur, now: int, months: int = EVENT_PARTITIONS_AHEAD):
+    """Mês corrente e os `months` seguintes, antes de os INSERTs precisarem deles."""
+    ts = now
+    for _ in range(months + 1):
+        _ensure_month_partition(cur, ts)
+        ts = _month_bounds(ts)[1]
+
+
 # =========================
 # INIT DB
 # =========================
@@ -52,13 +118,60 @@ def init_db():
             )
         """)
 
+        # Particionada por mês (RANGE em timestamp). Instalações antigas com
+        # a tabela simples continuam a funcionar; a retenção usa DELETE.
         cur.execute("""
             CREATE TABLE IF NOT EXISTS event_history (
-                id SERIAL PRIMARY KEY,
+                id BIGSERIAL,
                 query TEXT,
                 hard_data TEXT,
                 verdict_summary TEXT,
-                timestamp BIGINT
+                timestamp BIGINT NOT NULL,
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """)
+        global _PG_PARTITIONED
+        _PG_PARTITIONED = _pg_is_partitioned(cur)
+        if _PG_PARTITIONED:
+            cur.execute("CREATE TABLE IF NOT EXISTS event_history_default PARTITION OF event_history DEFAULT")
+            _ensure_upcoming_partitions(cur, int(time.time()))
+        else:
+            logger.warning("event_history sem particionamento (tabela legada); retenção via DELETE.")
+
+        # Centroide narrativo (float32) — fonte de verdade do índice vetorial
+        cur.execute("ALTER TABLE event_history ADD COLUMN IF NOT EXISTS embedding BYTEA")
+
+        # Full-text (query + veredito) como coluna gerada + GIN
+        cur.execute("""
+            ALTER TABLE event_history
+            ADD COLUMN IF NOT EXISTS search tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('simple', coalesce(query, '') || ' ' || coalesce(verdict_summary, ''))
+            ) STORED
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_event_history_search ON event_history USING GIN (search)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_event_history_ts ON event_history (timestamp DESC)")
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS event_daily_aggregate (
+                query TEXT,
+                day DATE,
+                event_count INTEGER,
+                first_ts BIGINT,
+                last_ts BIGINT,
+                last_verdict TEXT,
+                hard_data TEXT,
+                PRIMARY KEY (query, day)
+            )
+        """)
+
+        # ids retirados pela compactação: os outros processos sincronizam o
+        # índice vetorial a partir daqui em vez de varrer event_history
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS event_tombstones (
+                seq BIGSERIAL PRIMARY KEY,
+                event_id BIGINT NOT NULL,
+                deleted_at BIGINT NOT NULL
             )
         """)
 
@@ -68,6 +181,19 @@ def init_db():
                 weight REAL
             )
         """)
+        conn.commit()
+
+        # pg_trgm acelera o ILIKE por substring; exige privilégio de extensão
+        try:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_event_history_query_trgm
+                ON event_history USING GIN (query gin_trgm_ops)
+            """)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.warning(f"pg_trgm indisponível, ILIKE sem índice: {e}")
     else:
         # ---------- SQLITE ----------
         cur.execute("""
@@ -87,6 +213,58 @@ def init_db():
                 timestamp INTEGER
             )
         """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_event_history_ts ON event_history (timestamp DESC)")
+
+        # SQLite: uma única tabela "quente", limitada pela retenção
+        # (FTS5 e índice vetorial dependem de um único espaço de ids).
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS event_daily_aggregate (
+                query TEXT,
+                day TEXT,
+                event_count INTEGER,
+                first_ts INTEGER,
+                last_ts INTEGER,
+                last_verdict TEXT,
+                hard_data TEXT,
+                PRIMARY KEY (query, day)
+            )
+        """)
+
+        cur.execute("PRAGMA table_info(event_history)")
+        if "embedding" not in {r[1] for r in cur.fetchall()}:
+            cur.execute("ALTER TABLE event_history ADD COLUMN embedding BLOB")
+
+        # FTS5 externo (content=) sincronizado por triggers
+        try:
+            cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'event_history_fts'")
+            fts_exists = cur.fetchone() is not None
+            cur.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS event_history_fts USING fts5(
+                    query, verdict_summary,
+                    content='event_history', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS event_history_ai AFTER INSERT ON event_history BEGIN
+                    INSERT INTO event_history_fts(rowid, query, verdict_summary)
+                    VALUES (new.id, new.query, new.verdict_summary);
+                END;
+                CREATE TRIGGER IF NOT EXISTS event_history_ad AFTER DELETE ON event_history BEGIN
+                    INSERT INTO event_history_fts(event_history_fts, rowid, query, verdict_summary)
+                    VALUES ('delete', old.id, old.query, old.verdict_summary);
+                END;
+            """)
+            if not fts_exists:
+                # indexa o histórico que já existia antes do FTS
+                cur.execute("INSERT INTO event_history_fts(event_history_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 indisponível no SQLite, usando LIKE: {e}")
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS event_tombstones (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id INTEGER NOT NULL,
+                deleted_at INTEGER NOT NULL
+            )
+        """)
 
         cur.execute("""
             CREATE TABLE IF NOT EXISTS trusted_sources (
@@ -117,6 +295,7 @@ def init_db():
 
     conn.commit()
     conn.close()
+    bump_trusted_version()
     logger.info(f"Database inicializado ({'Postgres' if DATABASE_URL else 'SQLite'}).")
 
 
@@ -163,86 +342,503 @@ def get_profile(source: str):
 # HISTÓRICO DE EVENTOS
 # =========================
 
-def store_event(query: str, hard_data: dict, verdict_summary: str):
+def store_event(query: str, hard_data: dict, verdict_summary: str, embedding=None):
+    """
+    Grava o episódio. Com `embedding` (centroide narrativo), o evento entra
+    também no índice vetorial usado por get_semantic_events.
+    """
     conn = get_db_connection()
     cur = conn.cursor()
     now = int(time.time())
     payload = json.dumps(hard_data)
+    blob = (
+        np.asarray(embedding, dtype=np.float32).tobytes()
+        if embedding is not None else None
+    )
 
     if DATABASE_URL:
+        if _PG_PARTITIONED:
+            _ensure_month_partition(cur, now)
         cur.execute("""
-            INSERT INTO event_history (query, hard_data, verdict_summary, timestamp)
-            VALUES (%s, %s, %s, %s)
-        """, (query, payload, verdict_summary, now))
+            INSERT INTO event_history (query, hard_data, verdict_summary, timestamp, embedding)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING id
+        """, (query, payload, verdict_summary, now, psycopg2.Binary(blob) if blob else None))
+        event_id = cur.fetchone()[0]
     else:
         cur.execute("""
-            INSERT INTO event_history (query, hard_data, verdict_summary, timestamp)
-            VALUES (?, ?, ?, ?)
-        """, (query, payload, verdict_summary, now))
+            INSERT INTO event_history (query, hard_data, verdict_summary, timestamp, embedding)
+            VALUES (?, ?, ?, ?, ?)
+        """, (query, payload, verdict_summary, now, blob))
+        event_id = cur.lastrowid
 
     conn.commit()
     conn.close()
 
+    if embedding is not None:
+        try:
+            get_event_index().add([event_id], [embedding])
+        except Exception as e:
+            logger.warning(f"Falha ao indexar evento {event_id}: {e}")
+
+    return event_id
+
+
+_FTS_TOKEN = re.compile(r"\w+", re.UNICODE)
+_FTS_OPERATORS = {"or", "and", "not", "near"}
+
+
+def fts_match_expr(query: str) -> str:
+    """'oil OR petroleum' -> '"oil" OR "petroleum"' (termos citados, sem sintaxe FTS crua)."""
+    terms = [
+        t for t in _FTS_TOKEN.findall(query.lower())
+        if t not in _FTS_OPERATORS
+    ]
+    return " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+
+
+def _rows_to_events(rows):
+    return [
+        {
+            "query": r[0],
+            "data": json.loads(r[1]),
+            "verdict": r[2]
+        }
+        for r in rows
+    ]
+
 
 def get_similar_events(query: str, limit: int = 2):
+    """
+    Eventos passados relevantes para `query`, ordenados por relevância
+    (query pesa mais que o veredito) e depois por recência.
+    """
     conn = get_db_connection()
     cur = conn.cursor()
 
     if DATABASE_URL:
+        # tsvector (GIN) para termos + ILIKE acelerado por pg_trgm para substrings
         cur.execute("""
             SELECT query, hard_data, verdict_summary
             FROM event_history
-            WHERE query ILIKE %s
-            ORDER BY timestamp DESC
+            WHERE search @@ websearch_to_tsquery('simple', %s)
+               OR query ILIKE %s
+            ORDER BY ts_rank(search, websearch_to_tsquery('simple', %s)) DESC,
+                     timestamp DESC
             LIMIT %s
-        """, (f"%{query}%", limit))
+        """, (query, f"%{query}%", query, limit))
+        rows = cur.fetchall()
     else:
-        cur.execute("""
-            SELECT query, hard_data, verdict_summary
-            FROM event_history
-            WHERE query LIKE ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """, (f"%{query}%", limit))
+        match = fts_match_expr(query)
+        if not match:
+            conn.close()
+            return []
+        try:
+            cur.execute("""
+                SELECT e.query, e.hard_data, e.verdict_summary
+                FROM event_history_fts
+                JOIN event_history e ON e.id = event_history_fts.rowid
+                WHERE event_history_fts MATCH ?
+                ORDER BY bm25(event_history_fts, 2.0, 1.0), e.timestamp DESC
+                LIMIT ?
+            """, (match, limit))
+        except sqlite3.OperationalError:
+            # SQLite sem FTS5
+            cur.execute("""
+                SELECT query, hard_data, verdict_summary
+                FROM event_history
+                WHERE query LIKE ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            """, (f"%{query}%", limit))
+        rows = cur.fetchall()
 
-    rows = cur.fetchall()
     conn.close()
+    return _rows_to_events(rows)
 
-    return [
-        {
-            "query": r[0],
-            "data": json.loads(r[1]),
-            "verdict": r[2]
-        }
-        for r in rows
+
+# =========================
+# MEMÓRIA SEMÂNTICA (ÍNDICE VETORIAL)
+# =========================
+
+EVENT_INDEX_SYNC_SECONDS = int(os.getenv("EVENT_INDEX_SYNC_SECONDS", "30"))
+# ids abaixo do high-water mark revistos a cada passagem: um BIGSERIAL é
+# atribuído no INSERT mas só fica visível no COMMIT, fora de ordem
+EVENT_INDEX_SYNC_OVERLAP = int(os.getenv("EVENT_INDEX_SYNC_OVERLAP", "200"))
+# ids por SELECT ... IN na sincronização
+_SYNC_FETCH = 500
+_EVENT_INDEX_SYNCED_AT = 0.0
+_EVENT_INDEX_HWM = None     # maior id de event_history visto pela sincronização
+_TOMBSTONE_HWM = 0          # maior seq de event_tombstones já aplicado
+
+
+def _sync_event_index(force: bool = False):
+    """
+    Reconcilia o índice local com a tabela: acrescenta os eventos gravados
+    por outros processos e retira os compactados noutro worker.
+    A primeira passagem do processo compara os conjuntos de ids completos
+    (o índice em disco pode vir de qualquer momento); as seguintes só leem
+    ids acima do high-water mark (menos EVENT_INDEX_SYNC_OVERLAP) e as
+    remoções novas em event_tombstones. Throttled para não pesar na busca.
+    """
+    global _EVENT_INDEX_SYNCED_AT, _EVENT_INDEX_HWM, _TOMBSTONE_HWM
+    index = get_event_index()
+    if index.shared:
+        return index
+    if not force and time.time() - _EVENT_INDEX_SYNCED_AT < EVENT_INDEX_SYNC_SECONDS:
+        return index
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    placeholder = "%s" if DATABASE_URL else "?"
+    indexed = index.ids()
+
+    cur.execute("SELECT COALESCE(MAX(seq), 0) FROM event_tombstones")
+    tombstone_hwm = cur.fetchone()[0]
+
+    if _EVENT_INDEX_HWM is None:
+        cur.execute("SELECT id FROM event_history WHERE embedding IS NOT NULL")
+        db_ids = {r[0] for r in cur.fetchall()}
+        stale = indexed - db_ids
+    else:
+        cur.execute(f"""
+            SELECT id FROM event_history
+            WHERE id > {placeholder} AND embedding IS NOT NULL
+        """, (_EVENT_INDEX_HWM - EVENT_INDEX_SYNC_OVERLAP,))
+        db_ids = {r[0] for r in cur.fetchall()}
+        cur.execute(f"""
+            SELECT event_id FROM event_tombstones
+            WHERE seq > {placeholder} AND seq <= {placeholder}
+        """, (_TOMBSTONE_HWM, tombstone_hwm))
+        stale = {r[0] for r in cur.fetchall()} & indexed
+    missing = sorted(db_ids - indexed)
+
+    rows = []
+    for i in range(0, len(missing), _SYNC_FETCH):
+        chunk = missing[i:i + _SYNC_FETCH]
+        cur.execute(f"""
+            SELECT id, embedding
+            FROM event_history
+            WHERE id IN ({", ".join([placeholder] * len(chunk))})
+        """, chunk)
+        rows.extend(cur.fetchall())
+    conn.close()
+
+    if rows:
+        index.add(
+            [r[0] for r in rows],
+            np.stack([np.frombuffer(bytes(r[1]), dtype=np.float32) for r in rows])
+        )
+    if stale:
+        index.remove(stale)
+    if rows or stale:
+        logger.info(f"Índice de eventos sincronizado (+{len(rows)} / -{len(stale)}).")
+
+    if db_ids:
+        _EVENT_INDEX_HWM = max(max(db_ids), _EVENT_INDEX_HWM or 0)
+    elif _EVENT_INDEX_HWM is None:
+        _EVENT_INDEX_HWM = 0
+    _TOMBSTONE_HWM = tombstone_hwm
+    _EVENT_INDEX_SYNCED_AT = time.time()
+    return index
+
+
+def get_semantic_events(embedding, limit: int = 3, min_score: float = 0.5):
+    """Episódios passados cujo centroide narrativo é próximo de `embedding`."""
+    hits = [
+        (eid, score)
+        for eid, score in _sync_event_index().search(embedding, limit)
+        if score >= min_score
     ]
+    if not hits:
+        return []
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    placeholder = "%s" if DATABASE_URL else "?"
+    ids = [eid for eid, _ in hits]
+    cur.execute(f"""
+        SELECT id, query, hard_data, verdict_summary
+        FROM event_history
+        WHERE id IN ({", ".join([placeholder] * len(ids))})
+    """, ids)
+    by_id = {r[0]: r[1:] for r in cur.fetchall()}
+    conn.close()
+
+    events = []
+    for eid, score in hits:
+        row = by_id.get(eid)
+        if row is None:
+            continue
+        event = _rows_to_events([row])[0]
+        event["similarity"] = round(score, 3)
+        events.append(event)
+    return events
 
 
 # =========================
-# FONTES CONFIÁVEIS (TIER 1)
+# RETENÇÃO / COMPACTAÇÃO
 # =========================
 
-def get_trusted_weight(source_name: str):
+EVENT_RETENTION_DAYS = int(os.getenv("EVENT_RETENTION_DAYS", "180"))
+EVENT_AGGREGATE_RETENTION_DAYS = int(os.getenv("EVENT_AGGREGATE_RETENTION_DAYS", "730"))
+# tempo em que os outros processos ainda leem as remoções (bem acima do sync)
+EVENT_TOMBSTONE_RETENTION_SECONDS = int(os.getenv("EVENT_TOMBSTONE_RETENTION_SECONDS", str(7 * 86400)))
+_COMPACTION_FETCH = 5000
+
+
+def _merge_hard_data(acc: dict, data: dict) -> dict:
+    for key in ("percentages", "monetary"):
+        merged = list(dict.fromkeys(acc.get(key, []) + data.get(key, [])))
+        acc[key] = merged[:10]
+    return acc
+
+
+def _utc_day(ts: int) -> str:
+    return datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+def compact_event_history(retention_days: int = None, now: int = None) -> int:
+    """
+    Enrola eventos mais antigos que a retenção em agregados por (query, dia)
+    e remove-os da tabela quente (DROP de partições mensais inteiras no
+    Postgres particionado, DELETE no resto). Retorna o nº de eventos compactados.
+    """
+    retention_days = EVENT_RETENTION_DAYS if retention_days is None else retention_days
+    now = now or int(time.time())
+    cutoff = now - retention_days * 86400
+    placeholder = "%s" if DATABASE_URL else "?"
+
     conn = get_db_connection()
     cur = conn.cursor()
-    s = source_name.lower()
 
-    if DATABASE_URL:
-        cur.execute("""
-            SELECT weight
-            FROM trusted_sources
-            WHERE %s LIKE '%%' || source || '%%'
-        """, (s,))
-    else:
+    cur.execute(f"""
+        SELECT id, query, hard_data, verdict_summary, timestamp
+        FROM event_history
+        WHERE timestamp < {placeholder}
+        ORDER BY timestamp, id
+    """, (cutoff,))
+
+    aggregates = {}
+    compacted_ids = []
+    while True:
+        rows = cur.fetchmany(_COMPACTION_FETCH)
+        if not rows:
+            break
+        for event_id, query, hard_data, verdict, ts in rows:
+            compacted_ids.append(event_id)
+            key = (query, _utc_day(ts))
+            agg = aggregates.setdefault(key, {
+                "count": 0, "first_ts": ts, "last_ts": ts,
+                "last_verdict": verdict, "hard_data": {}
+            })
+            agg["count"] += 1
+            agg["first_ts"] = min(agg["first_ts"], ts)
+            if ts >= agg["last_ts"]:
+                agg["last_ts"] = ts
+                agg["last_verdict"] = verdict
+            _merge_hard_data(agg["hard_data"], json.loads(hard_data or "{}"))
+
+    # merge com agregados de execuções anteriores (o mesmo dia pode ser
+    # compactado em duas passagens quando o cutoff cai a meio dele)
+    for (query, day), agg in aggregates.items():
+        cur.execute(f"""
+            SELECT event_count, first_ts, last_ts, last_verdict, hard_data
+            FROM event_daily_aggregate
+            WHERE query = {placeholder} AND day = {placeholder}
+        """, (query, day))
+        prev = cur.fetchone()
+        if prev:
+            agg["count"] += prev[0]
+            agg["first_ts"] = min(agg["first_ts"], prev[1])
+            if prev[2] > agg["last_ts"]:
+                agg["last_ts"], agg["last_verdict"] = prev[2], prev[3]
+            _merge_hard_data(agg["hard_data"], json.loads(prev[4] or "{}"))
+
+        values = (
+            query, day, agg["count"], agg["first_ts"], agg["last_ts"],
+            agg["last_verdict"], json.dumps(agg["hard_data"])
+        )
+        if DATABASE_URL:
+            cur.execute("""
+                INSERT INTO event_daily_aggregate
+                    (query, day, event_count, first_ts, last_ts, last_verdict, hard_data)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (query, day)
+                DO UPDATE SET
+                    event_count = EXCLUDED.event_count,
+                    first_ts = EXCLUDED.first_ts,
+                    last_ts = EXCLUDED.last_ts,
+                    last_verdict = EXCLUDED.last_verdict,
+                    hard_data = EXCLUDED.hard_data
+            """, values)
+        else:
+            cur.execute("""
+                REPLACE INTO event_daily_aggregate
+                    (query, day, event_count, first_ts, last_ts, last_verdict, hard_data)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, values)
+
+    # ---------- remoção da tabela quente ----------
+    if DATABASE_URL and _pg_is_partitioned(cur):
+        # store_event só cria a partição em falta; aqui ficam prontas antes
+        _ensure_upcoming_partitions(cur, now)
         cur.execute("""
-            SELECT weight
-            FROM trusted_sources
-            WHERE ? LIKE '%' || source || '%'
-        """, (s,))
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'event_history'
+              AND c.relname ~ '^event_history_[0-9]{6}$'
+        """)
+        for (name,) in cur.fetchall():
+            month = datetime.datetime.strptime(name[-6:], "%Y%m").replace(tzinfo=datetime.timezone.utc)
+            start, end = _month_bounds(int(month.timestamp()))
+            if end <= cutoff:
+                cur.execute(f"DROP TABLE IF EXISTS {name}")
+                _PARTITIONS_READY.discard(start)
+                logger.info(f"Partição expirada removida: {name}")
 
-    row = cur.fetchone()
+    cur.execute(f"DELETE FROM event_history WHERE timestamp < {placeholder}", (cutoff,))
+
+    if compacted_ids:
+        cur.executemany(
+            f"INSERT INTO event_tombstones (event_id, deleted_at) VALUES ({placeholder}, {placeholder})",
+            [(event_id, now) for event_id in compacted_ids]
+        )
+    cur.execute(
+        f"DELETE FROM event_tombstones WHERE deleted_at < {placeholder}",
+        (now - EVENT_TOMBSTONE_RETENTION_SECONDS,)
+    )
+
+    aggregate_cutoff = _utc_day(now - EVENT_AGGREGATE_RETENTION_DAYS * 86400)
+    cur.execute(
+        f"DELETE FROM event_daily_aggregate WHERE day < {placeholder}",
+        (aggregate_cutoff,)
+    )
+
+    if not DATABASE_URL and compacted_ids:
+        try:
+            # funde os segmentos do FTS depois do DELETE em massa
+            cur.execute("INSERT INTO event_history_fts(event_history_fts) VALUES ('optimize')")
+        except sqlite3.OperationalError:
+            pass
+
+    conn.commit()
     conn.close()
-    return row[0] if row else None
+
+    if compacted_ids:
+        try:
+            get_event_index().remove(compacted_ids)
+        except Exception as e:
+            logger.warning(f"Falha ao remover eventos compactados do índice: {e}")
+
+    logger.info(
+        f"Compactação: {len(compacted_ids)} eventos -> {len(aggregates)} agregados "
+        f"(retenção {retention_days}d)."
+    )
+    return len(compacted_ids)
+
+
+# =========================
+# FONTES CONFIÁVEIS (TIER 1)
+# =========================
+
+class _TrustedMatcher:
+    """
+    Autómato Aho-Corasick sobre os nomes em trusted_sources.
+    Resolve "nome contém alguma fonte confiável" em O(len(nome)),
+    independente do tamanho da lista.
+    """
+
+    def __init__(self, rows):
+        self.goto = [{}]
+        self.fail = [0]
+        # (comprimento do padrão, peso) do melhor match que termina no nó
+        self.out = [None]
+
+        for source, weight in rows:
+            if not source:
+                continue
+            node = 0
+            for ch in source:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(None)
+                node = nxt
+            self.out[node] = (len(source), weight)
+
+        # BFS para links de falha; propaga o match mais longo pelo sufixo
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                inherited = self.out[self.fail[nxt]]
+                if inherited and (not self.out[nxt] or inherited[0] > self.out[nxt][0]):
+                    self.out[nxt] = inherited
+
+    def match(self, text: str):
+        """Peso da fonte confiável mais longa contida em `text` (ou None)."""
+        node = 0
+        best = None
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            hit = self.out[node]
+            if hit and (best is None or hit[0] > best[0]):
+                best = hit
+        return best[1] if best else None
+
+
+# Cache em processo do autómato. A versão local sobe a cada escrita;
+# o TTL cobre escritas feitas por outros processos (API / workers).
+TRUSTED_REFRESH_SECONDS = int(os.getenv("TRUSTED_REFRESH_SECONDS", "300"))
+
+_TRUSTED_MATCHER = None
+_TRUSTED_VERSION = 0
+_TRUSTED_BUILT = (-1, 0.0)  # (versão, instante do build)
+
+
+def bump_trusted_version():
+    """Invalida o autómato; o próximo lookup reconstrói a partir da BD."""
+    global _TRUSTED_VERSION
+    _TRUSTED_VERSION += 1
+
+
+def _get_trusted_matcher():
+    global _TRUSTED_MATCHER, _TRUSTED_BUILT
+    version, built_at = _TRUSTED_BUILT
+    if (
+        _TRUSTED_MATCHER is None
+        or version != _TRUSTED_VERSION
+        or time.time() - built_at > TRUSTED_REFRESH_SECONDS
+    ):
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT source, weight FROM trusted_sources")
+        rows = cur.fetchall()
+        conn.close()
+
+        _TRUSTED_MATCHER = _TrustedMatcher(rows)
+        _TRUSTED_BUILT = (_TRUSTED_VERSION, time.time())
+        logger.debug(f"Autómato de fontes confiáveis reconstruído ({len(rows)} fontes).")
+    return _TRUSTED_MATCHER
+
+
+def get_trusted_weight(source_name: str):
+    if not source_name:
+        return None
+    return _get_trusted_matcher().match(source_name.lower())
 
 
 def add_trusted_source(source: str, weight: float = 0.95):
@@ -257,4 +853,5 @@ def add_trusted_source(source: str, weight: float = 0.95):
 
     conn.commit()
     conn.close()
+    bump_trusted_version()
     logger.info(f"Fonte confiável adicionada: {source} ({weight})")
@@ -1,4 +1,6 @@
+import os
 import core
+import time
 import datetime
 import logging
 import json
@@ -6,8 +8,10 @@ import numpy as np
 from collections import defaultdict
 
 # 🔹 INFRA
-from app.cache import check_cache, set_cache
-from app.ingest import fetch_data_entrypoint
+from app.cache import check_cache, set_cache, acquire_flight, release_flight, wait_for_flight
+from app.ingest import fetch_data_entrypoint, INGEST_DEADLINE_SECONDS
+from article_store import init_article_store, search_articles, store_articles
+from relevance import select_relevant
 
 # 🔹 INTELIGÊNCIA
 from embeddings import embed_texts
@@ -22,6 +26,7 @@ from memory import (
     get_profile,
     upsert_profile,
     get_similar_events,
+    get_semantic_events,
     get_trusted_weight,
     store_event
 )
@@ -29,17 +34,69 @@ from memory import (
 # 🔹 ANÁLISE
 from anti_manipulation import score_coordination
 from psychology import analyze_market_psychology
-from summarizer import local_summary, openai_strategic_analysis
+from summarizer import local_summary, submit_strategic_analysis, wait_strategic_analysis, LLM_TIMEOUT_SECONDS
 from data_extractor import extract_hard_data, format_data_for_prompt
 from alerts import send_telegram
 
 logger = logging.getLogger("horaculo.orchestrator")
-init_db()
+
+# Mínimo de artigos locais para dispensar a ida à rede
+ARTICLE_STORE_MIN_HITS = int(os.getenv("ARTICLE_STORE_MIN_HITS", "5"))
+
+# Orçamento de latência por query (s, 0 = sem limite). Etapas opcionais só
+# correm se o custo estimado couber no que resta; senão são substituídas.
+QUERY_BUDGET_SECONDS = float(os.getenv("QUERY_BUDGET_SECONDS", "15"))
+# Overrides: STAGE_COST_SECONDS="openai_analysis=10,sentiment=3"
+STAGE_COST_SECONDS = {"sentiment": 2.0, "clustering": 0.5, "openai_analysis": 8.0}
+STAGE_COST_SECONDS.update({
+    stage.strip(): float(cost)
+    for stage, cost in (
+        pair.split("=", 1)
+        for pair in os.getenv("STAGE_COST_SECONDS", "").split(",") if "=" in pair
+    )
+})
+# Resultado degradado fica fresco menos tempo: o próximo pedido refaz completo
+DEGRADED_CACHE_TTL = int(os.getenv("DEGRADED_CACHE_TTL", "60"))
 
 # ==========================================================
 # UTIL
 # ==========================================================
 
+_STORAGE_READY = False
+
+
+def init_storage():
+    """Schema da memória e da article store: no primeiro uso, não no import."""
+    global _STORAGE_READY
+    if not _STORAGE_READY:
+        init_db()
+        init_article_store()
+        _STORAGE_READY = True
+
+
+class QueryBudget:
+    """Tempo restante da query e registo das etapas degradadas."""
+
+    def __init__(self, seconds: float = QUERY_BUDGET_SECONDS):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.degraded = []
+
+    def remaining(self) -> float:
+        if not self.seconds or self.seconds <= 0:
+            return float("inf")
+        return self.seconds - (time.monotonic() - self.started)
+
+    def allows(self, stage: str) -> bool:
+        return self.remaining() >= STAGE_COST_SECONDS.get(stage, 0.0)
+
+    def degrade(self, stage: str, fallback: str):
+        logger.warning(
+            f"Orçamento: {stage} -> {fallback} ({max(0.0, self.remaining()):.1f}s restantes)"
+        )
+        self.degraded.append({"stage": stage, "fallback": fallback})
+
+
 def calculate_entropy(scores: list) -> float:
     if not scores or sum(scores) == 0:
         return 0.0
@@ -66,6 +123,29 @@ def score_source_credibility(source: str) -> float:
     return max(0.1, min(0.9, hits / total))
 
 
+def ensure_embeddings(items):
+    """Claim + embedding só para itens que não vieram já processados da store."""
+    missing = [k for k, it in enumerate(items) if it.get("embedding") is None]
+    if missing:
+        claims = batch_extract_claims([items[k]["text"] for k in missing])
+        for k, claim, emb in zip(missing, claims, embed_texts(claims)):
+            items[k]["claim"] = claim
+            items[k]["embedding"] = emb
+    return [it["embedding"] for it in items]
+
+
+def ensure_sentiments(items, compute_missing=True):
+    """compute_missing=False: só sentimentos já guardados; o resto conta como neutro."""
+    missing = [k for k, it in enumerate(items) if it.get("sentiment") is None]
+    if not compute_missing:
+        return [it["sentiment"] if it.get("sentiment") is not None else 0.0 for it in items]
+    if missing:
+        scores = batch_sentiment_score([items[k]["text"] for k in missing])
+        for k, score in zip(missing, scores):
+            items[k]["sentiment"] = score
+    return [it["sentiment"] for it in items]
+
+
 def update_memory(items, verdict, winner):
     for it in items:
         src = it["source"]
@@ -82,21 +162,60 @@ def update_memory(items, verdict, winner):
 # MAIN
 # ==========================================================
 
-def run_query(query, newsapi_key=None, use_openai=False, openai_key=None):
-    start = datetime.datetime.now()
+def run_query(query, newsapi_key=None, use_openai=False, openai_key=None, force_refresh=False,
+              on_stage=None, budget_seconds=None):
+    """
+    `on_stage(stage, payload)` recebe cada tela da UI assim que fica pronta
+    (streaming para o frontend); hits de cache só produzem o resultado final.
+    `budget_seconds`: orçamento de latência (default QUERY_BUDGET_SECONDS,
+    0 = sem limite, ex.: refresh em background).
+    """
     logger.info(f"🚀 QUERY: {query}")
+    init_storage()
+    budget = QueryBudget(QUERY_BUDGET_SECONDS if budget_seconds is None else budget_seconds)
+
+    # force_refresh: revalidação em background (ignora o resultado stale)
+    if not force_refresh:
+        cached = check_cache(query)
+        if cached:
+            return cached
+
+    # Single-flight: N pedidos idênticos em simultâneo -> 1 pipeline
+    token = acquire_flight(query)
+    if token is None:
+        logger.info(f"Análise idêntica em curso, aguardando: {query}")
+        result = wait_for_flight(query)
+        if result:
+            return result
+        token = acquire_flight(query)
+
+    try:
+        return _run_pipeline(query, newsapi_key, use_openai, openai_key, on_stage, budget)
+    finally:
+        if token:
+            release_flight(query, token)
+
+
+def _run_pipeline(query, newsapi_key, use_openai, openai_key, on_stage=None, budget=None):
+    start = datetime.datetime.now()
+    emit = on_stage or (lambda stage, payload: None)
+    budget = budget or QueryBudget()
+
+    # Store local alimentada pelo poller; rede só se não houver cobertura
+    items = search_articles(query)
+    from_store = len(items) >= ARTICLE_STORE_MIN_HITS
+    if not from_store:
+        items = fetch_data_entrypoint(
+            query, newsapi_key,
+            deadline=min(INGEST_DEADLINE_SECONDS, max(0.5, budget.remaining()))
+        )
 
-    cached = check_cache(query)
-    if cached:
-        return cached
-
-    items = fetch_data_entrypoint(query, newsapi_key)
+    # dedupe por URL + BM25: só o que é relevante chega aos modelos
+    items = select_relevant(items, query)
     if not items:
         return {"error": "NO_DATA"}
 
-    texts = [i["text"] for i in items]
-    claims = batch_extract_claims(texts)
-    embeddings = embed_texts(claims)
+    embeddings = ensure_embeddings(items)
 
     items_kept, embs_kept = dedupe_by_embeddings(items, embeddings, 0.92)
     if not items_kept:
@@ -105,13 +224,24 @@ def run_query(query, newsapi_key=None, use_openai=False, openai_key=None):
     kept_texts = [i["text"] for i in items_kept]
     kept_sources = [i["source"] for i in items_kept]
 
-    sentiments = batch_sentiment_score(kept_texts)
+    # FinBERT é a etapa mais cara depois dos embeddings: sem tempo, só cache
+    compute_sentiment = budget.allows("sentiment")
+    if not compute_sentiment and any(it.get("sentiment") is None for it in items_kept):
+        budget.degrade("sentiment", "cached_only")
+    sentiments = ensure_sentiments(items_kept, compute_missing=compute_sentiment)
+    if not from_store:
+        # write-through: a próxima query com estes artigos não reprocessa
+        store_articles(items_kept)
     credibility = [score_source_credibility(s) for s in kept_sources]
 
-    cluster_labels = cluster_embeddings(
-        embs_kept,
-        k=min(4, max(2, len(embs_kept) // 5))
-    )
+    if budget.allows("clustering"):
+        cluster_labels = cluster_embeddings(
+            embs_kept,
+            k=min(4, max(2, len(embs_kept) // 5))
+        )
+    else:
+        budget.degrade("clustering", "single_cluster")
+        cluster_labels = [0] * len(embs_kept)
 
     engine = core.HoraculoEngine(0.92)
     verdicts = engine.analyze_batch(embs_kept, kept_sources)
@@ -131,8 +261,6 @@ def run_query(query, newsapi_key=None, use_openai=False, openai_key=None):
     final_verdict = verdicts[best_idx]
     winner_source = kept_sources[best_idx]
 
-    update_memory(items_kept, final_verdict, winner_source)
-
     coordination_score = score_coordination(kept_sources)
     psych_report = analyze_market_psychology(
         sentiments,
@@ -161,6 +289,14 @@ def run_query(query, newsapi_key=None, use_openai=False, openai_key=None):
         for k, v in clusters_map.items()
     )
 
+    # Episódios passados com narrativa semelhante (centroide dos embeddings)
+    narrative_centroid = np.mean(np.asarray(embs_kept, dtype=np.float32), axis=0)
+    similar_events = get_semantic_events(narrative_centroid, limit=3)
+    memory_context = "\n".join(
+        f"[{e['similarity']:.2f}] {e['query']}: {e['verdict']}"
+        for e in similar_events
+    )
+
     analysis_payload = {
         "raw_texts": kept_texts,
         "verdict": final_verdict.explanation,
@@ -168,76 +304,114 @@ def run_query(query, newsapi_key=None, use_openai=False, openai_key=None):
         "psychology": psych_report,
         "hard_data": data_evidence,
         "cluster_context": cluster_context,
+        "memory_context": memory_context,
         "eden_signal": eden_signal,
         "entropy": global_entropy
     }
 
-    summary = (
-        openai_strategic_analysis(analysis_payload, openai_key)
-        if use_openai else
-        local_summary(kept_texts)
-    )
+    run_openai = use_openai
+    if use_openai and not budget.allows("openai_analysis"):
+        budget.degrade("openai_analysis", "local_summary")
+        run_openai = False
+
+    # LLM no loop de I/O assim que o prompt tem tudo: as telas, a memória
+    # e a gravação do evento são montadas enquanto ele corre
+    llm_future = submit_strategic_analysis(analysis_payload, openai_key) if run_openai else None
+
+    update_memory(items_kept, final_verdict, winner_source)
 
     # ==========================================================
-    # UI PAYLOAD (🔥 O QUE PEDISTE)
+    # TELAS 1-3 (🔥 saem já, com o LLM a correr; o resumo é o estágio lento)
     # ==========================================================
 
-    ui_payload = {
-
-        # TELA 1 — RADAR
-        "screen_arbitrage": {
-            "points": [
-                {
-                    "source": items_kept[i]["source"],
-                    "sentiment": sentiments[i],
-                    "credibility": get_trusted_weight(items_kept[i]["source"]) or 0.5,
-                    "label": items_kept[i]["title"][:50]
-                }
-                for i in range(len(items_kept))
-            ],
-            "eden_detected": eden_signal["detected"],
-            "eden_source": eden_signal["source"],
-            "intensity_score": float(final_verdict.intensity)
-        },
+    # TELA 1 — RADAR
+    screen_arbitrage = {
+        "points": [
+            {
+                "source": items_kept[i]["source"],
+                "sentiment": sentiments[i],
+                "credibility": get_trusted_weight(items_kept[i]["source"]) or 0.5,
+                "label": items_kept[i]["title"][:50]
+            }
+            for i in range(len(items_kept))
+        ],
+        "eden_detected": eden_signal["detected"],
+        "eden_source": eden_signal["source"],
+        "intensity_score": float(final_verdict.intensity)
+    }
+    emit("screen_arbitrage", screen_arbitrage)
+
+    # TELA 2 — INTELIGÊNCIA
+    screen_intelligence = {
+        "clusters": [
+            {
+                "id": cid,
+                "sources": [
+                    items_kept[i]["source"]
+                    for i, c in enumerate(cluster_labels) if c == cid
+                ],
+                "sentiment_avg": float(np.mean([
+                    sentiments[i]
+                    for i, c in enumerate(cluster_labels) if c == cid
+                ]))
+            }
+            for cid in set(cluster_labels)
+        ],
+        "coordination_score": coordination_score
+    }
+    emit("screen_intelligence", screen_intelligence)
+
+    # TELA 3 — PSICOLOGIA
+    screen_stress = {
+        "entropy": float(global_entropy),
+        "mood": psych_report["mood"],
+        "is_trap": psych_report["is_trap"],
+        "is_crowded": psych_report["is_crowded"],
+        "asymmetry": psych_report["asymmetry_level"]
+    }
+    emit("screen_stress", screen_stress)
 
-        # TELA 2 — INTELIGÊNCIA
-        "screen_intelligence": {
-            "clusters": [
-                {
-                    "id": cid,
-                    "sources": [
-                        items_kept[i]["source"]
-                        for i, c in enumerate(cluster_labels) if c == cid
-                    ],
-                    "sentiment_avg": float(np.mean([
-                        sentiments[i]
-                        for i, c in enumerate(cluster_labels) if c == cid
-                    ]))
-                }
-                for cid in set(cluster_labels)
-            ],
-            "coordination_score": coordination_score
-        },
+    store_event(query, hard_data, final_verdict.explanation, embedding=narrative_centroid)
 
-        # TELA 3 — PSICOLOGIA
-        "screen_stress": {
-            "entropy": float(global_entropy),
-            "mood": psych_report["mood"],
-            "is_trap": psych_report["is_trap"],
-            "is_crowded": psych_report["is_crowded"],
-            "asymmetry": psych_report["asymmetry_level"]
-        },
+    summary = None
+    if llm_future is not None:
+        summary = wait_strategic_analysis(
+            llm_future,
+            timeout=max(0.5, min(LLM_TIMEOUT_SECONDS, budget.remaining()))
+        )
+        if summary is None:
+            budget.degrade("openai_analysis", "local_summary")
+    if not summary:
+        summary = local_summary(
+            kept_texts,
+            embeddings=embs_kept,
+            clusters=cluster_labels,
+            sources=kept_sources,
+            claims=[it.get("claim") for it in items_kept]
+        )
 
-        # TELA 4 — PORTAL
-        "screen_portal": {
-            "summary": summary,
-            "hard_data": hard_data,
-            "meta": {
-                "execution_time": f"{(datetime.datetime.now()-start).total_seconds():.2f}s",
-                "sources_count": len(items_kept)
-            }
+    # TELA 4 — PORTAL
+    screen_portal = {
+        "summary": summary,
+        "hard_data": hard_data,
+        "meta": {
+            "execution_time": f"{(datetime.datetime.now()-start).total_seconds():.2f}s",
+            "sources_count": len(items_kept),
+            "degraded": [d["stage"] for d in budget.degraded]
         }
     }
+    emit("screen_portal", screen_portal)
+
+    # ==========================================================
+    # UI PAYLOAD
+    # ==========================================================
+
+    ui_payload = {
+        "screen_arbitrage": screen_arbitrage,
+        "screen_intelligence": screen_intelligence,
+        "screen_stress": screen_stress,
+        "screen_portal": screen_portal
+    }
 
     # ==========================================================
     # RESULT FINAL
@@ -254,13 +428,23 @@ def run_query(query, newsapi_key=None, use_openai=False, openai_key=None):
         "psychology": psych_report,
         "summary": summary,
         "hard_data": hard_data,
+        "similar_events": similar_events,
         "ui": ui_payload,
+        # etapas substituídas por falta de orçamento: [{"stage", "fallback"}]
+        "degraded": budget.degraded,
         "timestamp": datetime.datetime.utcnow().isoformat()
     }
 
-    set_cache(query, result_json)
+    if budget.degraded:
+        set_cache(query, result_json, ttl=DEGRADED_CACHE_TTL, use_openai=use_openai)
+    else:
+        set_cache(query, result_json, use_openai=use_openai)
 
     if eden_signal["detected"] or final_verdict.intensity > 0.6:
-        send_telegram(f"🚨 EDEN SIGNAL\n{query}\n{summary[:200]}")
+        # enfileirado: o envio corre em background (dedupe por query)
+        send_telegram(
+            f"🚨 EDEN SIGNAL\n{query}\n{summary[:200]}",
+            dedupe_key=f"eden:{query.strip().lower()}"
+        )
 
     return result_json
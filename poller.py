@@ -0,0 +1,79 @@
+# python/app/poller.py
+import os
+import time
+import logging
+
+from app.http_pool import run_sync
+from app.ingest import poll_sources
+from article_store import (
+    init_article_store,
+    known_urls,
+    store_articles,
+    prune_articles,
+    url_key
+)
+from claim_extract import batch_extract_claims
+from embeddings import embed_texts
+from sentiment import batch_sentiment_score
+
+logger = logging.getLogger("horaculo.poller")
+
+POLL_INTERVAL_SECONDS = float(os.getenv("POLL_INTERVAL_SECONDS", "60"))
+# Queries permanentes da NewsAPI (separadas por vírgula)
+POLL_NEWSAPI_QUERIES = [
+    q.strip() for q in os.getenv("POLL_NEWSAPI_QUERIES", "").split(",") if q.strip()
+]
+
+
+def process_new_items(items):
+    """
+    Filtra o que já está na store e processa o resto uma única vez:
+    claim -> embedding, texto -> sentimento.
+    """
+    fresh = {}
+    for it in items:
+        fresh.setdefault(url_key(it.get("url", ""), it.get("text", "")), it)
+
+    for key in known_urls(fresh.keys()):
+        fresh.pop(key, None)
+
+    new_items = list(fresh.values())
+    if not new_items:
+        return 0
+
+    texts = [i["text"] for i in new_items]
+    claims = batch_extract_claims(texts)
+    embeddings = embed_texts(claims)
+    sentiments = batch_sentiment_score(texts)
+
+    for it, claim, emb, sent in zip(new_items, claims, embeddings, sentiments):
+        it["claim"] = claim
+        it["embedding"] = emb
+        it["sentiment"] = sent
+
+    return store_articles(new_items)
+
+
+def poll_once(api_key=None):
+    items = run_sync(poll_sources(api_key, POLL_NEWSAPI_QUERIES))
+    stored = process_new_items(items)
+    pruned = prune_articles()
+    logger.info(f"Poll: {len(items)} lidos, {stored} novos, {pruned} expirados.")
+    return stored
+
+
+def run_forever(api_key=None, interval=POLL_INTERVAL_SECONDS):
+    init_article_store()
+    logger.info(f"Poller iniciado (intervalo {interval:.0f}s).")
+    while True:
+        started = time.monotonic()
+        try:
+            poll_once(api_key)
+        except Exception as e:
+            logger.error(f"Falha no ciclo de polling: {e}")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_forever(os.getenv("NEWSAPI_KEY"))
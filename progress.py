@@ -0,0 +1,137 @@
+# python/app/progress.py
+import os
+import json
+import time
+import asyncio
+import logging
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger("horaculo.progress")
+
+# ======================================================
+# CONFIG
+# ======================================================
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# quanto tempo os estágios ficam disponíveis para quem se liga tarde
+PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", "900"))
+PROGRESS_MAXLEN = 32
+# duração máxima de uma ligação SSE
+STREAM_TIMEOUT = float(os.getenv("STREAM_TIMEOUT", "180"))
+# comentário SSE periódico para proxies não fecharem a ligação
+STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", "15"))
+
+# eventos terminais
+DONE = "done"
+ERROR = "error"
+
+# ======================================================
+# FORMATO
+# ======================================================
+# Um Redis Stream por tarefa: o worker faz XADD a cada estágio e o SSE lê
+# com XREAD desde o início, por isso quem se liga tarde recebe o que já
+# saiu e não há corrida entre "ler histórico" e "subscrever".
+
+
+def _stream_key(task_id: str) -> str:
+    return f"horaculo:progress:{task_id}"
+
+
+def _json_default(obj):
+    # numpy scalars / arrays do pipeline
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return str(obj)
+
+
+def final_payload(result: dict) -> dict:
+    """Evento `done`: o que a UI precisa (telas ou o erro do pipeline)."""
+    result = result or {}
+    return {k: result[k] for k in ("ui", "error", "stale") if k in result}
+
+
+def sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+# ======================================================
+# PUBLICAÇÃO (WORKER, SÍNCRONO)
+# ======================================================
+_SYNC_CLIENT = None
+
+
+def _get_sync_client():
+    global _SYNC_CLIENT
+    if _SYNC_CLIENT is None:
+        _SYNC_CLIENT = redis.from_url(REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _SYNC_CLIENT
+
+
+def publish_stage(task_id: str, stage: str, payload=None):
+    """Best-effort: sem Redis o cliente fica só com o resultado final."""
+    if not task_id:
+        return
+    key = _stream_key(task_id)
+    try:
+        pipe = _get_sync_client().pipeline(transaction=False)
+        pipe.xadd(
+            key,
+            {"event": stage, "data": json.dumps(payload, default=_json_default)},
+            maxlen=PROGRESS_MAXLEN,
+            approximate=True
+        )
+        pipe.expire(key, PROGRESS_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Falha ao publicar estágio {stage} de {task_id}: {e}")
+
+
+def stage_publisher(task_id: str):
+    """Callback on_stage(stage, payload) para o run_query."""
+    return lambda stage, payload: publish_stage(task_id, stage, payload)
+
+
+# ======================================================
+# CONSUMO (API, ASYNC)
+# ======================================================
+# redis.asyncio está preso ao loop onde abriu as conexões (ver http_pool)
+_ASYNC_CLIENTS = {}
+
+
+def _get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        client = _ASYNC_CLIENTS[loop] = aioredis.from_url(REDIS_URL, decode_responses=True)
+    return client
+
+
+async def iter_stages(task_id: str, timeout: float = STREAM_TIMEOUT):
+    """
+    Gera (evento, data_json) desde o primeiro estágio publicado até
+    `done`/`error`. Em silêncio gera ("ping", None) a cada STREAM_HEARTBEAT s.
+    """
+    client = _get_async_client()
+    key = _stream_key(task_id)
+    last_id = "0-0"
+    deadline = time.monotonic() + timeout
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            yield ERROR, json.dumps({"error": "STREAM_TIMEOUT"})
+            return
+        resp = await client.xread(
+            {key: last_id},
+            count=PROGRESS_MAXLEN,
+            block=max(1, int(min(STREAM_HEARTBEAT, remaining) * 1000))
+        )
+        if not resp:
+            yield "ping", None
+            continue
+        for _, entries in resp:
+            for entry_id, fields in entries:
+                last_id = entry_id
+                yield fields["event"], fields["data"]
+                if fields["event"] in (DONE, ERROR):
+                    return
@@ -0,0 +1,124 @@
+# python/app/relevance.py
+import os
+import re
+import math
+import logging
+from collections import Counter
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger("horaculo.relevance")
+
+# Máximo de artigos que seguem para embeddings / FinBERT
+RELEVANCE_TOP_N = int(os.getenv("RELEVANCE_TOP_N", "40"))
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_QUERY_OPERATORS = {"or", "and", "not"}
+_TRACKING_PARAMS = re.compile(
+    r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|cmpid|ref|ref_src|src|taid|mod|ncid|yptr|guccounter)$",
+    re.IGNORECASE
+)
+
+
+# ======================================================
+# URL CANÓNICA + DEDUPE EXATO
+# ======================================================
+def canonicalize_url(url: str) -> str:
+    """
+    Forma canónica para comparar artigos entre fontes:
+    esquema/host em minúsculas, sem www., fragmento, parâmetros de tracking
+    nem barra final; query string ordenada.
+    """
+    if not url:
+        return ""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _TRACKING_PARAMS.match(k)
+    ))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https" if parts.scheme in ("http", "https") else parts.scheme, host, path, query, ""))
+
+
+def dedupe_by_url(items):
+    """Remove repetições exatas (mesma URL canónica; título quando não há link)."""
+    seen = set()
+    kept = []
+    for it in items:
+        key = canonicalize_url(it.get("url", "")) or " ".join(_TOKEN.findall(it.get("title", "").lower()))
+        if key and key in seen:
+            continue
+        seen.add(key)
+        kept.append(it)
+    return kept
+
+
+# ======================================================
+# BM25 CONTRA A QUERY
+# ======================================================
+def query_terms(query: str):
+    return [
+        t for t in dict.fromkeys(_TOKEN.findall(query.lower()))
+        if t not in _QUERY_OPERATORS
+    ]
+
+
+def bm25_scores(query: str, docs, k1: float = 1.5, b: float = 0.75):
+    """BM25 de cada doc contra os termos da query (IDF do próprio lote)."""
+    terms = query_terms(query)
+    tokenized = [_TOKEN.findall(d.lower()) for d in docs]
+    if not terms or not tokenized:
+        return [0.0] * len(docs)
+
+    n = len(tokenized)
+    avg_len = sum(len(t) for t in tokenized) / n or 1.0
+    df = Counter(term for toks in tokenized for term in set(toks) & set(terms))
+    idf = {
+        t: math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+        for t in terms
+    }
+
+    scores = []
+    for toks in tokenized:
+        tf = Counter(toks)
+        norm = k1 * (1 - b + b * len(toks) / avg_len)
+        scores.append(sum(
+            idf[t] * tf[t] * (k1 + 1) / (tf[t] + norm)
+            for t in terms if tf[t]
+        ))
+    return scores
+
+
+def scored_text(it) -> str:
+    """Título + descrição + corpo do artigo, sem contar a descrição duas vezes."""
+    title = it.get("title") or ""
+    description = it.get("description") or ""
+    text = it.get("text") or ""
+    # o ingest monta text = "título . descrição": só o que vem depois é corpo
+    prefix = f"{title} . {description}"
+    body = text[len(prefix):] if text.startswith(prefix) else text
+    return " ".join(p for p in (title, description, body) if p)
+
+
+def select_relevant(items, query: str, top_n: int = RELEVANCE_TOP_N):
+    """
+    Estágio barato antes do ML: dedupe por URL canónica e depois só os
+    top-N itens com algum termo da query (por BM25 em título, descrição
+    e corpo).
+    """
+    unique = dedupe_by_url(items)
+    scores = bm25_scores(query, [scored_text(it) for it in unique])
+    ranked = sorted(
+        (pair for pair in zip(scores, range(len(unique))) if pair[0] > 0),
+        key=lambda pair: -pair[0]
+    )[:top_n]
+
+    logger.info(
+        f"Relevância: {len(items)} itens -> {len(unique)} únicos -> {len(ranked)} relevantes"
+    )
+    return [unique[i] for _, i in ranked]
@@ -7,12 +7,15 @@ import sys
 # se estiver a executar a partir da pasta 'python/'
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
-try:
-    # Tenta importar do pacote app (estrutura recomendada)
-    from app.orchestrator import run_query
-except ImportError:
-    # Fallback se os ficheiros estiverem todos na mesma pasta
-    from orchestrator import run_query
+def _load_run_query():
+    # import tardio: --help e erros de argumentos não carregam torch/transformers
+    try:
+        # Tenta importar do pacote app (estrutura recomendada)
+        from app.orchestrator import run_query
+    except ImportError:
+        # Fallback se os ficheiros estiverem todos na mesma pasta
+        from orchestrator import run_query
+    return run_query
 
 def main():
     parser = argparse.ArgumentParser(description="Horaculo V2 CLI Runner")
@@ -20,8 +23,18 @@ def main():
     parser.add_argument("--query", default="oil OR petroleum OR OPEC", help="Search query for analysis")
     parser.add_argument("--use_openai", action="store_true", help="Use OpenAI for summarization instead of local model")
     parser.add_argument("--openai_key", default=os.getenv("OPENAI_API_KEY"), help="OpenAI API Key")
+    parser.add_argument("--warmup", action="store_true", help="Load and warm models before the query (prints timings)")
     
     args = parser.parse_args()
+    run_query = _load_run_query()
+
+    if args.warmup:
+        try:
+            from app.warmup import warm_models
+        except ImportError:
+            from warmup import warm_models
+        for name, secs in warm_models().items():
+            print(f"Warmup {name}: {secs:.2f}s")
 
     print(f"--- Iniciando Horaculo V2 ---")
     print(f"Query: {args.query}")
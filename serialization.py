@@ -0,0 +1,126 @@
+# python/app/serialization.py
+import os
+import json
+import zlib
+import logging
+
+logger = logging.getLogger("horaculo.serialization")
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+# "msgpack" | "orjson" | "json" — cai para o melhor disponível
+SERIALIZER = os.getenv("HORACULO_SERIALIZER", "msgpack")
+# "zstd" | "zlib" | "none"
+COMPRESSION = os.getenv("HORACULO_COMPRESSION", "zstd")
+# payloads pequenos não compensam o custo de comprimir
+COMPRESS_MIN_BYTES = int(os.getenv("HORACULO_COMPRESS_MIN_BYTES", "1024"))
+
+# ======================================================
+# FORMATO
+# ======================================================
+# 2 bytes de cabeçalho: [formato][compressão]. Leitores aceitam qualquer
+# combinação (e JSON legado sem cabeçalho), por isso mudar a config não
+# invalida o que já está no Redis. msgpack e zstandard são dependências
+# obrigatórias de quem lê (API e workers usam a mesma imagem); os imports
+# opcionais só servem quem escreve, que cai para orjson/zlib sem eles.
+_FMT_JSON, _FMT_MSGPACK = b"J", b"M"
+_CMP_NONE, _CMP_ZLIB, _CMP_ZSTD = b"-", b"z", b"Z"
+
+_ZSTD_C = zstandard.ZstdCompressor(level=3) if HAS_ZSTD else None
+_ZSTD_D = zstandard.ZstdDecompressor() if HAS_ZSTD else None
+
+
+def _default(obj):
+    # numpy scalars / arrays que escapem do pipeline
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Tipo não serializável: {type(obj)!r}")
+
+
+def _encode_body(obj):
+    if SERIALIZER == "msgpack" and HAS_MSGPACK:
+        return _FMT_MSGPACK, msgpack.packb(obj, default=_default, use_bin_type=True)
+    if SERIALIZER in ("msgpack", "orjson") and HAS_ORJSON:
+        return _FMT_JSON, orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return _FMT_JSON, json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj) -> bytes:
+    fmt, body = _encode_body(obj)
+    if len(body) < COMPRESS_MIN_BYTES or COMPRESSION == "none":
+        return fmt + _CMP_NONE + body
+    if COMPRESSION == "zstd" and HAS_ZSTD:
+        return fmt + _CMP_ZSTD + _ZSTD_C.compress(body)
+    return fmt + _CMP_ZLIB + zlib.compress(body, 6)
+
+
+class MissingCodec(RuntimeError):
+    """Payload num formato cujo pacote não está instalado neste processo."""
+
+
+def _require(available: bool, package: str, codec: str):
+    if not available:
+        raise MissingCodec(
+            f"Payload em {codec}, mas o pacote '{package}' não está instalado "
+            f"neste processo (pip install {package}; ver requirements.txt)."
+        )
+
+
+def loads(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if not data:
+        return None
+
+    fmt, cmp, body = data[:1], data[1:2], data[2:]
+    if fmt not in (_FMT_JSON, _FMT_MSGPACK) or cmp not in (_CMP_NONE, _CMP_ZLIB, _CMP_ZSTD):
+        # JSON legado (antes do cabeçalho)
+        return json.loads(data)
+
+    if cmp == _CMP_ZSTD:
+        _require(HAS_ZSTD, "zstandard", "zstd")
+        body = _ZSTD_D.decompress(body)
+    elif cmp == _CMP_ZLIB:
+        body = zlib.decompress(body)
+
+    if fmt == _FMT_MSGPACK:
+        _require(HAS_MSGPACK, "msgpack", "msgpack")
+        return msgpack.unpackb(body, raw=False)
+    return orjson.loads(body) if HAS_ORJSON else json.loads(body)
+
+
+# ======================================================
+# CELERY / KOMBU
+# ======================================================
+CELERY_CONTENT_TYPE = "application/x-horaculo"
+
+
+def register_celery_serializer(name: str = "horaculo"):
+    """Regista o serializer no kombu para usar como result_serializer."""
+    from kombu.serialization import register
+    register(
+        name,
+        dumps,
+        loads,
+        content_type=CELERY_CONTENT_TYPE,
+        content_encoding="binary"
+    )
+    return name
@@ -1,109 +1,158 @@
 # python/app/summarizer.py
 import os
+import asyncio
+import hashlib
+import concurrent.futures
 import logging
-import re
+import numpy as np
+
+from app.textprep import STOPWORDS, BOILERPLATE_PATTERNS, prepare  # noqa: F401 (reexport)
 
 logger = logging.getLogger("horaculo.summarizer")
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
     HAS_OPENAI = True
 except ImportError:
     HAS_OPENAI = False
 
+# Endpoint alternativo (proxy, Azure-compatível ou servidor stub de testes)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+# Respostas por hash do prompt: payload igual -> sem nova chamada
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(6 * 3600)))
+LLM_TEMPERATURE = 0.1
+LLM_MAX_TOKENS = 1000
+SYSTEM_PROMPT = "Senior investment strategist detecting market manipulation."
+
 
 # ======================================================
 # TOKEN SIEVE — LIMPEZA AGRESSIVA
 # ======================================================
-STOPWORDS = {
-    "the", "a", "an", "and", "or", "but", "if", "in", "on", "at", "for",
-    "to", "of", "with", "by", "from", "as", "is", "are", "was", "were",
-    "be", "been", "this", "that", "these", "those", "it", "its",
-    "will", "would", "could", "should", "may", "might", "can",
-}
-
-BOILERPLATE_PATTERNS = [
-    r"copyright.*?reserved\.?",
-    r"all rights reserved\.?",
-    r"reuters",
-    r"associated press",
-    r"©\s?\d{4}",
-]
-
+# Padrões pré-compilados e cache por hash do conteúdo em textprep.py
+# (a mesma passagem produz a claim e os factos numéricos).
 def token_sieve(text: str) -> str:
-    if not text:
-        return ""
+    return prepare(text).clean
 
-    # lowercase
-    text = text.lower()
 
-    # remove boilerplate jurídico/jornalístico
-    for pattern in BOILERPLATE_PATTERNS:
-        text = re.sub(pattern, "", text, flags=re.IGNORECASE)
+# ======================================================
+# RESUMO LOCAL (EXTRATIVO)
+# ======================================================
+LOCAL_SUMMARY_SENTENCES = int(os.getenv("LOCAL_SUMMARY_SENTENCES", "4"))
+# MMR: 1.0 = só centralidade, 0.0 = só diversidade
+LOCAL_SUMMARY_LAMBDA = float(os.getenv("LOCAL_SUMMARY_LAMBDA", "0.7"))
+# Acima disto duas frases contam como a mesma informação
+LOCAL_SUMMARY_REDUNDANCY = 0.9
 
-    # remove pontuação inútil
-    text = re.sub(r"[^\w\s\.\-]", "", text)
 
-    # remove stopwords
-    words = [
-        w for w in text.split()
-        if w not in STOPWORDS and len(w) > 2
-    ]
+def rank_central(embeddings, clusters=None):
+    """
+    Relevância de cada item: similaridade média aos restantes (mesmo cosseno
+    do core, embeddings normalizados) mais o peso da sua narrativa (cluster).
+    Devolve (relevância, matriz de similaridade).
+    """
+    E = np.asarray(embeddings, dtype=np.float32)
+    E = E / np.maximum(np.linalg.norm(E, axis=1, keepdims=True), 1e-12)
+    sims = E @ E.T
+    n = len(E)
+    if n < 2:
+        return np.ones(n, dtype=np.float32), sims
 
-    return " ".join(words)
+    centrality = (sims.sum(axis=1) - 1.0) / (n - 1)
+    span = centrality.max() - centrality.min()
+    centrality = (centrality - centrality.min()) / span if span > 1e-9 else np.ones(n)
 
+    if clusters is not None and len(clusters) == n:
+        labels = np.asarray(clusters)
+        _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+        share = counts[inverse] / n
+        return 0.7 * centrality + 0.3 * share, sims
+    return centrality, sims
 
-# ======================================================
-# FALLBACK LOCAL
-# ======================================================
-def local_summary(texts):
+
+def mmr_select(relevance, sims, k, lam=LOCAL_SUMMARY_LAMBDA):
+    """Maximal Marginal Relevance: centrais mas não redundantes entre si."""
+    selected = []
+    candidates = list(range(len(relevance)))
+    while candidates and len(selected) < k:
+        if selected:
+            redundancy = sims[np.ix_(candidates, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(candidates))
+        # praticamente repetidas do que já foi escolhido: fora
+        fresh = redundancy < LOCAL_SUMMARY_REDUNDANCY
+        candidates = [c for c, keep in zip(candidates, fresh) if keep]
+        if not candidates:
+            break
+        redundancy = redundancy[fresh]
+        scores = lam * relevance[candidates] - (1 - lam) * redundancy
+        selected.append(candidates.pop(int(np.argmax(scores))))
+    return selected
+
+
+def local_summary(texts, embeddings=None, clusters=None, sources=None, claims=None,
+                  k=LOCAL_SUMMARY_SENTENCES):
+    """
+    Resumo extrativo em milissegundos: as claims mais centrais e diversas
+    (MMR sobre os embeddings já calculados). Sem embeddings, as primeiras
+    notícias limpas.
+    """
     if not texts:
         return "Sem dados para resumir."
 
-    summary = "Resumo Local:\n"
-    for t in texts[:3]:
-        clean = token_sieve(t)
-        summary += f"- {clean[:150]}...\n"
+    if embeddings is None or len(embeddings) != len(texts):
+        summary = "Resumo Local:\n"
+        for t in texts[:3]:
+            clean = token_sieve(t)
+            summary += f"- {clean[:150]}...\n"
+        return summary
+
+    relevance, sims = rank_central(embeddings, clusters)
+    picked = mmr_select(relevance, sims, k)
+
+    narratives = len(set(clusters)) if clusters is not None else None
+    summary = f"Resumo Local ({len(texts)} notícias"
+    summary += f", {narratives} narrativas):\n" if narratives else "):\n"
+    for i in picked:
+        sentence = ((claims[i] if claims else None) or texts[i]).strip()
+        if len(sentence) > 200:
+            sentence = sentence[:200].rsplit(" ", 1)[0] + "..."
+        source = f"[{sources[i]}] " if sources else ""
+        summary += f"- {source}{sentence}\n"
     return summary
 
 
 # ======================================================
 # OPENAI STRATEGIC ANALYSIS
 # ======================================================
-def openai_strategic_analysis(data_payload, api_key=None, model="gpt-4o-mini"):
-    if not HAS_OPENAI:
-        return "ERRO: Biblioteca 'openai' não instalada."
+class LLMUnavailable(RuntimeError):
+    """Sem biblioteca ou sem API key: o chamador usa o resumo local."""
 
-    final_api_key = api_key or os.getenv("OPENAI_API_KEY")
-    if not final_api_key:
-        return "ERRO: API Key da OpenAI não fornecida."
 
-    try:
-        client = OpenAI(api_key=final_api_key)
-
-        # ------------------------------
-        # EXTRAÇÃO + LIMPEZA
-        # ------------------------------
-        raw_texts = data_payload.get("raw_texts", [])[:10]
-        cleaned_texts = [token_sieve(t) for t in raw_texts]
-
-        verdict_expl = data_payload.get("verdict", "N/A")
-        intensity = data_payload.get("intensity", 0.0)
-        eden_data = data_payload.get("eden_signal", {})
-        eden_str = (
-            f"DETECTADO ({eden_data.get('source')})"
-            if eden_data.get("detected")
-            else "NÃO DETECTADO"
-        )
-        psych = data_payload.get("psychology", {})
-        hard_data = token_sieve(data_payload.get("hard_data", ""))
-        memory = token_sieve(data_payload.get("memory_context", ""))
-        clusters = token_sieve(data_payload.get("cluster_context", ""))
-
-        # ------------------------------
-        # PROMPT OTIMIZADO
-        # ------------------------------
-        prompt = f"""
+def build_strategic_prompt(data_payload) -> str:
+    # ------------------------------
+    # EXTRAÇÃO + LIMPEZA
+    # ------------------------------
+    raw_texts = data_payload.get("raw_texts", [])[:10]
+    cleaned_texts = [token_sieve(t) for t in raw_texts]
+
+    verdict_expl = data_payload.get("verdict", "N/A")
+    intensity = data_payload.get("intensity", 0.0)
+    eden_data = data_payload.get("eden_signal", {})
+    eden_str = (
+        f"DETECTADO ({eden_data.get('source')})"
+        if eden_data.get("detected")
+        else "NÃO DETECTADO"
+    )
+    psych = data_payload.get("psychology", {})
+    hard_data = token_sieve(data_payload.get("hard_data", ""))
+    memory = token_sieve(data_payload.get("memory_context", ""))
+    clusters = token_sieve(data_payload.get("cluster_context", ""))
+
+    # ------------------------------
+    # PROMPT OTIMIZADO
+    # ------------------------------
+    return f"""
 ANALISTA MACRO SÊNIOR. IGNORE RUÍDO. EXTRAIA SINAL.
 
 HORACULO:
@@ -131,24 +180,126 @@ TAREFA:
 4 cenários base otimista pessimista
 """
 
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Senior investment strategist detecting market manipulation."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.1,
-            max_tokens=1000
+
+def _prompt_key(model: str, prompt: str) -> str:
+    h = hashlib.sha256(
+        f"{model}|{LLM_TEMPERATURE}|{LLM_MAX_TOKENS}|{SYSTEM_PROMPT}|{prompt}".encode("utf-8")
+    ).hexdigest()
+    return f"horaculo:llm:{h}"
+
+
+# Um cliente por (loop, api key), sobre o pool HTTP do processo
+_CLIENTS = {}
+
+
+def _get_client(api_key: str):
+    from app.http_pool import get_client
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get((loop, api_key))
+    if client is None:
+        client = _CLIENTS[(loop, api_key)] = AsyncOpenAI(
+            api_key=api_key,
+            base_url=OPENAI_BASE_URL,
+            http_client=get_client(),
+            max_retries=1
         )
+    return client
+
+
+def _prepare_strategic_request(data_payload, api_key, model):
+    """Prompt, chave de cache e api key (CPU puro: fora do loop de I/O)."""
+    if not HAS_OPENAI:
+        raise LLMUnavailable("Biblioteca 'openai' não instalada.")
+    final_api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not final_api_key:
+        raise LLMUnavailable("API Key da OpenAI não fornecida.")
+    prompt = build_strategic_prompt(data_payload)
+    return prompt, _prompt_key(model, prompt), final_api_key
+
+
+async def _complete_strategic(prompt, key, api_key, model, timeout):
+    """Só a chamada à API corre no loop; o Redis (síncrono) vai para um thread."""
+    response = await _get_client(api_key).chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=LLM_TEMPERATURE,
+        max_tokens=LLM_MAX_TOKENS,
+        timeout=timeout
+    )
+    text = response.choices[0].message.content
+    if text:
+        from app.cache import set_value
+        await asyncio.to_thread(set_value, key, text, LLM_CACHE_TTL)
+    return text
+
 
-        return response.choices[0].message.content
+async def openai_strategic_analysis_async(data_payload, api_key=None, model="gpt-4o-mini",
+                                          timeout=LLM_TIMEOUT_SECONDS):
+    """
+    Análise estratégica com cache por hash do prompt. Levanta exceção em
+    falha (LLMUnavailable, timeout, erro da API) para o chamador degradar.
+    """
+    from app.cache import get_value
+    prompt, key, final_api_key = await asyncio.to_thread(
+        _prepare_strategic_request, data_payload, api_key, model
+    )
+    cached = await asyncio.to_thread(get_value, key)
+    if cached:
+        logger.info("Análise estratégica servida do cache (prompt idêntico).")
+        return cached
+    return await _complete_strategic(prompt, key, final_api_key, model, timeout)
 
+
+def submit_strategic_analysis(data_payload, api_key=None, model="gpt-4o-mini"):
+    """
+    Monta o prompt e consulta o cache no thread de quem chama; só a chamada
+    à API vai para o loop de I/O partilhado. Devolve um Future (já resolvido
+    num hit do cache ou numa falha de preparação).
+    """
+    from app.cache import get_value
+    from app.http_pool import get_loop
+    future = concurrent.futures.Future()
+    try:
+        prompt, key, final_api_key = _prepare_strategic_request(data_payload, api_key, model)
+        cached = get_value(key)
+    except Exception as e:
+        future.set_exception(e)
+        return future
+    if cached:
+        logger.info("Análise estratégica servida do cache (prompt idêntico).")
+        future.set_result(cached)
+        return future
+    return asyncio.run_coroutine_threadsafe(
+        _complete_strategic(prompt, key, final_api_key, model, LLM_TIMEOUT_SECONDS),
+        get_loop()
+    )
+
+
+def wait_strategic_analysis(future, timeout: float):
+    """
+    Espera pelo Future de submit_strategic_analysis até `timeout` s.
+    Devolve o texto, ou None (timeout / falha) para o chamador usar o
+    resumo local; no timeout a chamada é cancelada.
+    """
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        logger.warning(f"Análise OpenAI excedeu {timeout:.1f}s; resumo local.")
+    except Exception as e:
+        logger.warning(f"Análise OpenAI indisponível: {e}")
+    return None
+
+
+def openai_strategic_analysis(data_payload, api_key=None, model="gpt-4o-mini"):
+    """Versão síncrona (compatível): devolve o texto ou a mensagem de erro."""
+    try:
+        return submit_strategic_analysis(data_payload, api_key, model).result(LLM_TIMEOUT_SECONDS + 5)
+    except LLMUnavailable as e:
+        return f"ERRO: {e}"
     except Exception as e:
         logger.error(f"Erro na OpenAI: {e}")
         return f"Falha na geração do resumo estratégico: {str(e)}"
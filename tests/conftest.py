@@ -0,0 +1,8 @@
+# python/app/tests/conftest.py
+import os
+import sys
+
+# Os módulos importam-se como `app.x` e pelo nome curto (ver orchestrator):
+# o pai de app/ e o próprio app/ no path, como no container.
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.dirname(APP_DIR), APP_DIR]
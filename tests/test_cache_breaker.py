@@ -0,0 +1,47 @@
+# python/app/tests/test_cache_breaker.py
+import time
+
+import pytest
+import redis
+
+from app.cache import GuardedRedis, RedisUnavailable
+
+
+def _refused():
+    raise redis.ConnectionError("refused")
+
+
+def _half_open(guard):
+    for _ in range(guard.breaker.threshold):
+        with pytest.raises(redis.ConnectionError):
+            guard.call(_refused)
+    assert not guard.available
+    with pytest.raises(RedisUnavailable):
+        guard.call(lambda: "ok")
+    # cooldown esgotado: a próxima chamada é a sonda
+    guard.breaker._opened_at = time.monotonic() - guard.breaker.cooldown - 1
+
+
+def _oom():
+    raise redis.ResponseError("OOM command not allowed")
+
+
+def test_redis_error_on_probe_closes_breaker():
+    guard = GuardedRedis("redis://127.0.0.1:1/0", name="teste")
+    _half_open(guard)
+
+    with pytest.raises(redis.ResponseError):
+        guard.call(_oom)
+    assert guard.available
+    assert guard.call(lambda: "ok") == "ok"
+
+
+def test_foreign_error_on_probe_releases_it():
+    guard = GuardedRedis("redis://127.0.0.1:1/0", name="teste")
+    _half_open(guard)
+
+    with pytest.raises(ValueError):
+        guard.call(lambda: int("x"))
+    # a sonda foi libertada: outra pode passar (e fechar o breaker)
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.available
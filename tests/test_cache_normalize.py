@@ -0,0 +1,25 @@
+# python/app/tests/test_cache_normalize.py
+from app.cache import _has_query_operators, normalize_query
+
+
+def test_term_order_and_noise_do_not_change_key():
+    assert normalize_query("Petroleum,  oil!") == normalize_query("the oil petroleum") == "oil petroleum"
+
+
+def test_operators_stay_in_place():
+    assert normalize_query("BTC NOT etf") == "btc not etf"
+    assert normalize_query("etf not btc") == "etf not btc"
+    assert normalize_query("gold or silver") == normalize_query("silver OR gold")
+
+
+def test_parentheses_are_kept_in_key():
+    grouped = normalize_query("(oil or gas) and opec")
+    assert grouped == "( oil or gas ) and opec"
+    assert grouped != normalize_query("oil or (gas and opec)")
+    assert normalize_query("(oil or gas) and opec") == normalize_query("( OIL or gas ) AND opec")
+
+
+def test_operator_queries_are_flagged():
+    assert _has_query_operators(normalize_query("btc not etf"))
+    assert _has_query_operators(normalize_query("(btc etf)"))
+    assert not _has_query_operators(normalize_query("btc etf"))
@@ -0,0 +1,113 @@
+# python/app/tests/test_ingest_feed_cache.py
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app import ingest
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 06 Sep 2021 16:45:00 GMT"
+
+FEED = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Stand-in</title>
+<item><title>Oil rises</title><link>https://example.test/1</link><description>OPEC cuts</description></item>
+<item><title>Gold falls</title><link>https://example.test/2</link><description>Fed hikes</description></item>
+</channel></rss>"""
+
+
+class _FeedHandler(BaseHTTPRequestHandler):
+    # pedidos recebidos: (If-None-Match, If-Modified-Since)
+    seen = []
+
+    def do_GET(self):
+        inm = self.headers.get("If-None-Match")
+        ims = self.headers.get("If-Modified-Since")
+        self.seen.append((inm, ims))
+        if inm == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml")
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(FEED)))
+        self.end_headers()
+        self.wfile.write(FEED)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feed_url():
+    _FeedHandler.seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FeedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/feed.rss"
+    yield url
+    server.shutdown()
+    server.server_close()
+    ingest._FEED_CACHE.pop(url, None)
+    ingest._FEED_STATS.pop(url, None)
+
+
+def _fetch(url, min_refresh):
+    async def go():
+        async with httpx.AsyncClient() as client:
+            return await ingest._fetch_rss_async(client, url, 10, min_refresh=min_refresh)
+    return asyncio.run(go())
+
+
+def test_first_fetch_stores_validators(feed_url):
+    items = _fetch(feed_url, min_refresh=60)
+
+    assert [i["title"] for i in items] == ["Oil rises", "Gold falls"]
+    assert _FeedHandler.seen == [(None, None)]
+    cached = ingest._FEED_CACHE[feed_url]
+    assert cached["etag"] == ETAG
+    assert cached["last_modified"] == LAST_MODIFIED
+
+
+def test_min_refresh_interval_skips_network(feed_url):
+    first = _fetch(feed_url, min_refresh=60)
+    second = _fetch(feed_url, min_refresh=60)
+
+    assert second == first
+    assert len(_FeedHandler.seen) == 1
+
+
+def test_conditional_get_reuses_parse_on_304(feed_url):
+    first = _fetch(feed_url, min_refresh=60)
+    checked_at = ingest._FEED_CACHE[feed_url]["checked_at"]
+
+    # intervalo mínimo esgotado: revalida com os validadores guardados
+    second = _fetch(feed_url, min_refresh=0)
+
+    assert _FeedHandler.seen[1] == (ETAG, LAST_MODIFIED)
+    assert second == first
+    assert ingest._FEED_CACHE[feed_url]["checked_at"] > checked_at
+    assert ingest.get_feed_stats(feed_url).samples == 2
+
+
+def test_limit_applies_to_cached_items(feed_url):
+    _fetch(feed_url, min_refresh=60)
+
+    async def go():
+        async with httpx.AsyncClient() as client:
+            return await ingest._fetch_rss_async(client, feed_url, 1, min_refresh=60)
+
+    assert [i["title"] for i in asyncio.run(go())] == ["Oil rises"]
+
+
+def test_returned_items_do_not_alias_cache(feed_url):
+    first = _fetch(feed_url, min_refresh=60)
+    first[0]["title"] = "mutated"
+
+    second = _fetch(feed_url, min_refresh=60)
+    assert second[0]["title"] == "Oil rises"
+    assert ingest._FEED_CACHE[feed_url]["items"][0]["title"] == "Oil rises"
@@ -0,0 +1,120 @@
+# python/app/tests/test_summarizer_llm.py
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+
+from app import cache, http_pool, summarizer
+
+PAYLOAD = {
+    "raw_texts": ["Oil prices rise as OPEC signals deeper output cuts."],
+    "verdict": "supply shock",
+    "intensity": 0.7,
+    "psychology": {"mood": "fear", "is_crowded": False},
+    "hard_data": "10%",
+    "cluster_context": "Grupo 0: [reuters] oil",
+    "memory_context": "",
+    "eden_signal": {"detected": False},
+    "entropy": 0.4
+}
+
+
+class _CompletionsHandler(BaseHTTPRequestHandler):
+    calls = 0
+    delay = 0.0
+
+    def do_POST(self):
+        type(self).calls += 1
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.delay)
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"analysis #{self.calls}"},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # cliente desistiu (timeout)
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    _CompletionsHandler.calls = 0
+    _CompletionsHandler.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CompletionsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # cache do LLM em memória (sem Redis no teste)
+    store = {}
+    monkeypatch.setattr(cache, "get_value", store.get)
+    monkeypatch.setattr(cache, "set_value", lambda key, value, ttl: store.__setitem__(key, value))
+    monkeypatch.setattr(summarizer, "OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(summarizer, "_CLIENTS", {})
+    yield store
+    server.shutdown()
+    server.server_close()
+
+
+def test_identical_prompt_is_served_from_cache(stub_llm):
+    first = summarizer.openai_strategic_analysis(PAYLOAD, api_key="test")
+    second = summarizer.openai_strategic_analysis(PAYLOAD, api_key="test")
+
+    assert first == second == "analysis #1"
+    assert _CompletionsHandler.calls == 1
+    assert list(stub_llm) == [summarizer._prompt_key("gpt-4o-mini", summarizer.build_strategic_prompt(PAYLOAD))]
+
+
+def test_different_prompt_calls_the_model(stub_llm):
+    summarizer.openai_strategic_analysis(PAYLOAD, api_key="test")
+    other = summarizer.openai_strategic_analysis(dict(PAYLOAD, verdict="demand collapse"), api_key="test")
+
+    assert other == "analysis #2"
+    assert _CompletionsHandler.calls == 2
+    assert len(stub_llm) == 2
+
+
+def test_timeout_falls_back_without_caching(stub_llm):
+    _CompletionsHandler.delay = 2.0
+
+    started = time.monotonic()
+    future = summarizer.submit_strategic_analysis(PAYLOAD, api_key="test")
+    summary = summarizer.wait_strategic_analysis(future, timeout=0.3)
+
+    assert summary is None
+    assert time.monotonic() - started < 1.5
+    assert future.cancelled()
+    assert stub_llm == {}
+
+
+def test_cache_hit_resolves_before_reaching_the_io_loop(stub_llm, monkeypatch):
+    summarizer.openai_strategic_analysis(PAYLOAD, api_key="test")
+
+    def no_loop():
+        raise AssertionError("hit do cache não deve agendar nada no loop de I/O")
+
+    monkeypatch.setattr(http_pool, "get_loop", no_loop)
+    future = summarizer.submit_strategic_analysis(PAYLOAD, api_key="test")
+
+    assert future.done()
+    assert future.result() == "analysis #1"
+    assert _CompletionsHandler.calls == 1
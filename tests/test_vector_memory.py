@@ -0,0 +1,74 @@
+# python/app/tests/test_vector_memory.py
+import numpy as np
+import pytest
+
+from app import vector_memory
+from app.vector_memory import LocalEventIndex
+
+
+@pytest.fixture
+def dense(monkeypatch, tmp_path):
+    # backend denso (numpy), o padrão sem hnswlib
+    monkeypatch.setattr(vector_memory, "HAS_HNSWLIB", False)
+    return str(tmp_path / "event_index")
+
+
+def _vecs(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_add_and_search_returns_nearest_first(dense):
+    index = LocalEventIndex(dense)
+    vecs = _vecs(5)
+    index.add([10, 11, 12, 13, 14], vecs)
+
+    hits = index.search(vecs[2], k=3)
+    assert hits[0][0] == 12
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+    assert len(index) == 5
+
+
+def test_add_ignores_ids_already_indexed(dense):
+    index = LocalEventIndex(dense)
+    vecs = _vecs(3)
+    index.add([1, 2, 3], vecs)
+    index.add([2, 3], vecs[1:])
+    assert len(index) == 3
+    assert len(index.search(vecs[0], k=10)) == 3
+
+
+def test_remove_drops_ids_from_results(dense):
+    index = LocalEventIndex(dense)
+    vecs = _vecs(4)
+    index.add([1, 2, 3, 4], vecs)
+    index.remove([2, 99])
+
+    assert index.ids() == {1, 3, 4}
+    assert 2 not in {eid for eid, _ in index.search(vecs[1], k=4)}
+
+
+def test_save_and_reload(dense):
+    vecs = _vecs(4)
+    index = LocalEventIndex(dense)
+    index.add([1, 2, 3, 4], vecs)
+    index.remove([3])
+    index.save()
+
+    reloaded = LocalEventIndex(dense)
+    assert reloaded.ids() == {1, 2, 4}
+    assert reloaded.search(vecs[3], k=1)[0][0] == 4
+
+
+def test_save_merges_other_process_without_resurrecting_removed(dense):
+    vecs = _vecs(4)
+    a = LocalEventIndex(dense)
+    b = LocalEventIndex(dense)
+    a.add([1, 2], vecs[:2])
+    a.save()
+    b.add([3, 4], vecs[2:])
+    b.save()
+    a.remove([3])
+    a.save()
+
+    assert LocalEventIndex(dense).ids() == {1, 2, 4}
@@ -0,0 +1,110 @@
+# python/app/textprep.py
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Tuple
+
+# ======================================================
+# PADRÕES (COMPILADOS UMA VEZ)
+# ======================================================
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "but", "if", "in", "on", "at", "for",
+    "to", "of", "with", "by", "from", "as", "is", "are", "was", "were",
+    "be", "been", "this", "that", "these", "those", "it", "its",
+    "will", "would", "could", "should", "may", "might", "can",
+}
+
+BOILERPLATE_PATTERNS = [
+    r"copyright.*?reserved\.?",
+    r"all rights reserved\.?",
+    r"reuters",
+    r"associated press",
+    r"©\s?\d{4}",
+]
+
+# aplicados ao texto já em minúsculas; em separado cada um mantém a busca
+# rápida pelo prefixo literal (uma alternação única é mais lenta)
+_BOILERPLATE = [re.compile(p) for p in BOILERPLATE_PATTERNS]
+_NOISE = re.compile(r"[^\w\s\.\-]")
+_SENTENCE_END = re.compile(r"[.!?]")
+# 10%, +5.4%, -0.2 %
+_PERCENT = re.compile(r"[+-]?\d+(?:\.\d+)?\s?%")
+# $100M, €1.5bn, USD 50k
+_MONETARY = re.compile(r"(?:[$€£]|USD|EUR|BRL)\s?\d+(?:\.\d+)?\s?(?:M|bn|k|milhões|bilhões)?")
+
+TEXTPREP_CACHE_SIZE = int(os.getenv("TEXTPREP_CACHE_SIZE", "4096"))
+
+
+class PreparedText(NamedTuple):
+    claim: str
+    clean: str
+    percentages: Tuple[str, ...]
+    monetary: Tuple[str, ...]
+
+
+# ======================================================
+# NORMALIZAÇÃO (UMA PASSAGEM POR TEXTO)
+# ======================================================
+def _claim(text: str) -> str:
+    # primeira frase; se for curta demais (título, dateline), a segunda
+    s = text.strip()
+    if not s:
+        return ""
+    parts = _SENTENCE_END.split(s, maxsplit=2)
+    first = parts[0].strip()
+    if len(first.split()) < 6 and len(parts) > 1:
+        return parts[1].strip()[:300]
+    return first[:300]
+
+
+def _clean(text: str) -> str:
+    text = text.lower()
+    for pattern in _BOILERPLATE:
+        text = pattern.sub("", text)
+    text = _NOISE.sub("", text)
+    return " ".join(
+        w for w in text.split()
+        if w not in STOPWORDS and len(w) > 2
+    )
+
+
+def _prepare(text: str) -> PreparedText:
+    return PreparedText(
+        claim=_claim(text),
+        clean=_clean(text),
+        percentages=tuple(_PERCENT.findall(text)) if "%" in text else (),
+        monetary=tuple(_MONETARY.findall(text))
+    )
+
+
+# ======================================================
+# CACHE POR HASH DO CONTEÚDO
+# ======================================================
+_CACHE = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def prepare(text: str) -> PreparedText:
+    """Claim, texto limpo e factos numéricos de `text` (cacheado)."""
+    text = str(text) if text else ""
+    if not text:
+        return PreparedText("", "", (), ())
+    key = hashlib.md5(text.encode("utf-8")).digest()
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            return hit
+
+    prepared = _prepare(text)
+    with _LOCK:
+        _CACHE[key] = prepared
+        if len(_CACHE) > TEXTPREP_CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return prepared
+
+
+def prepare_batch(texts) -> List[PreparedText]:
+    return [prepare(t) for t in texts]
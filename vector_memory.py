@@ -0,0 +1,431 @@
+# python/app/vector_memory.py
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+import numpy as np
+from contextlib import contextmanager
+
+logger = logging.getLogger("horaculo.vector_memory")
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: sem lock entre processos
+    fcntl = None
+
+try:
+    import hnswlib
+    HAS_HNSWLIB = True
+except ImportError:
+    HAS_HNSWLIB = False
+
+try:
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, PointIdsList, PointStruct, VectorParams
+    HAS_QDRANT = True
+except ImportError:
+    HAS_QDRANT = False
+
+# "local" (in-process, persistido em disco) ou "qdrant" (serviço do docker-compose)
+EVENT_INDEX_BACKEND = os.getenv("EVENT_INDEX_BACKEND", "local")
+EVENT_INDEX_PATH = os.getenv("EVENT_INDEX_PATH", "event_index")
+# gravação em disco numa thread de fundo, nunca no caminho da busca
+EVENT_INDEX_FLUSH_SECONDS = float(os.getenv("EVENT_INDEX_FLUSH_SECONDS", "15"))
+
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "horaculo_events")
+
+
+def _normalize(v) -> np.ndarray:
+    arr = np.asarray(v, dtype=np.float32)
+    norm = np.linalg.norm(arr, axis=-1, keepdims=True)
+    return arr / np.maximum(norm, 1e-12)
+
+
+# ======================================================
+# BACKEND LOCAL (HNSW / DENSO)
+# ======================================================
+@contextmanager
+def _file_lock(path: str, exclusive: bool):
+    # os filhos do prefork partilham os mesmos ficheiros do índice
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+class LocalEventIndex:
+    """
+    Índice vetorial em processo.
+    - HNSW (hnswlib) se instalado; slots apagados são reaproveitados
+    - Sem hnswlib (instalação padrão): matriz densa normalizada, busca
+      exata O(n) por produto interno
+    Persistido em `<path>.meta.json` + `<path>.npz` (ids; vetores no denso)
+    + `<path>.hnsw`. A fonte de verdade é a BD: o índice sabe que ids contém
+    e a sincronização acrescenta os que faltam e retira os que já não existem.
+    Vários processos gravam nos mesmos ficheiros: save() corre sob lock
+    exclusivo, junta primeiro o que outro processo gravou e substitui os
+    ficheiros de forma atómica. add()/remove() só marcam o índice como
+    sujo; a gravação corre numa thread de fundo a cada
+    EVENT_INDEX_FLUSH_SECONDS.
+    """
+
+    shared = False
+
+    def __init__(self, path: str = EVENT_INDEX_PATH):
+        self.path = path
+        self.dim = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._flusher_pid = None
+
+        self._hnsw = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vecs = None
+        self._size = 0
+        self._live = set()      # ids pesquisáveis
+        self._removed = set()   # retirados desde a última gravação
+
+        self._load()
+
+    # ---------- persistência ----------
+    def _read_meta(self):
+        meta_path = f"{self.path}.meta.json"
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # formato antigo (watermark por max_id) ou de outro backend: ignora
+        if "max_id" in meta or meta.get("kind") not in ("hnsw", "dense"):
+            return None
+        if meta["kind"] == "hnsw" and not HAS_HNSWLIB:
+            return None
+        return meta
+
+    def _load(self):
+        try:
+            with _file_lock(self.path, exclusive=False):
+                meta = self._read_meta()
+                if meta is None:
+                    return
+                data = np.load(f"{self.path}.npz")
+                ids = data["ids"]
+                if meta["kind"] == "hnsw":
+                    capacity = max(1024, len(ids) * 2)
+                    self._init_storage(meta["dim"], capacity=capacity)
+                    self._hnsw.load_index(
+                        f"{self.path}.hnsw", max_elements=capacity, allow_replace_deleted=True
+                    )
+                    self._size = self._hnsw.get_current_count()
+                else:
+                    self.dim = meta["dim"]
+                    self._ids = ids
+                    self._vecs = data["vecs"]
+                    self._size = len(ids)
+                self._live = set(ids.tolist())
+            logger.info(f"Índice de eventos carregado ({len(self._live)} vetores, {meta['kind']}).")
+        except Exception as e:
+            logger.warning(f"Índice de eventos ilegível, será reconstruído: {e}")
+            self.dim = None
+            self._hnsw = None
+            self._ids = np.empty(0, dtype=np.int64)
+            self._vecs = None
+            self._size = 0
+            self._live = set()
+
+    def _merge_from_disk(self):
+        """Acrescenta os vetores que outro processo gravou e este não tem."""
+        meta = self._read_meta()
+        if meta is None or meta["dim"] != self.dim:
+            return
+        disk_ids = np.load(f"{self.path}.npz")["ids"]
+        missing = [
+            i for i in disk_ids.tolist()
+            if i not in self._live and i not in self._removed
+        ]
+        if not missing:
+            return
+        if meta["kind"] == "dense":
+            mask = np.isin(disk_ids, missing)
+            vecs = np.load(f"{self.path}.npz")["vecs"][mask]
+            missing = disk_ids[mask]
+        else:
+            other = hnswlib.Index(space="ip", dim=self.dim)
+            other.load_index(f"{self.path}.hnsw", max_elements=max(1024, meta["count"]))
+            vecs = np.asarray(other.get_items(missing), dtype=np.float32)
+        self._add_locked(np.asarray(missing, dtype=np.int64), vecs)
+
+    def _replace(self, name: str, write):
+        # grava num temporário e troca: quem lê nunca vê um ficheiro a meio
+        tmp = f"{name}.{os.getpid()}.tmp"
+        write(tmp)
+        os.replace(tmp, name)
+
+    def save(self):
+        with self._lock:
+            if self.dim is None:
+                return
+            with _file_lock(self.path, exclusive=True):
+                try:
+                    self._merge_from_disk()
+                except Exception as e:
+                    logger.warning(f"Índice em disco ignorado na gravação: {e}")
+
+                live = np.fromiter(self._live, dtype=np.int64, count=len(self._live))
+                if self._hnsw is not None:
+                    kind = "hnsw"
+                    self._replace(f"{self.path}.hnsw", self._hnsw.save_index)
+                    arrays = {"ids": live}
+                else:
+                    kind = "dense"
+                    arrays = {"ids": self._ids[:self._size], "vecs": self._vecs[:self._size]}
+
+                def write_npz(tmp):
+                    with open(tmp, "wb") as f:
+                        np.savez(f, **arrays)
+
+                def write_meta(tmp):
+                    with open(tmp, "w") as f:
+                        json.dump({"kind": kind, "dim": self.dim, "count": len(live)}, f)
+
+                self._replace(f"{self.path}.npz", write_npz)
+                self._replace(f"{self.path}.meta.json", write_meta)
+            self._pending = 0
+            self._removed.clear()
+
+    # ---------- escrita ----------
+    def _init_storage(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        if HAS_HNSWLIB:
+            self._hnsw = hnswlib.Index(space="ip", dim=dim)
+            self._hnsw.init_index(
+                max_elements=capacity, ef_construction=200, M=16, allow_replace_deleted=True
+            )
+            self._hnsw.set_ef(64)
+        else:
+            self._ids = np.empty(capacity, dtype=np.int64)
+            self._vecs = np.empty((capacity, dim), dtype=np.float32)
+
+    def _add_locked(self, ids, vecs):
+        if self.dim is None:
+            self._init_storage(vecs.shape[1])
+
+        if self._hnsw is not None:
+            fresh = np.fromiter((i not in self._live for i in ids.tolist()), dtype=bool, count=len(ids))
+            ids, vecs = ids[fresh], vecs[fresh]
+            revived = []
+            for n, i in enumerate(ids.tolist()):
+                # id retirado e re-adicionado: o rótulo pode ainda ocupar o
+                # seu slot apagado; reativa-o em vez de duplicar o rótulo
+                try:
+                    self._hnsw.unmark_deleted(i)
+                    revived.append(n)
+                except RuntimeError:
+                    pass
+            if revived:
+                self._hnsw.add_items(vecs[revived], ids[revived])
+            new = np.ones(len(ids), dtype=bool)
+            new[revived] = False
+            if new.any():
+                # slots marcados como apagados são reaproveitados primeiro
+                vacant = self._size - (len(self._live) + len(revived))
+                needed = self._size + max(0, int(new.sum()) - vacant)
+                if needed > self._hnsw.get_max_elements():
+                    self._hnsw.resize_index(max(needed, 2 * self._hnsw.get_max_elements()))
+                self._hnsw.add_items(vecs[new], ids[new], replace_deleted=True)
+            self._size = self._hnsw.get_current_count()
+        else:
+            fresh = ~np.isin(ids, self._ids[:self._size])
+            ids, vecs = ids[fresh], vecs[fresh]
+            needed = self._size + len(ids)
+            if needed > len(self._ids):
+                cap = max(needed, 2 * len(self._ids))
+                self._ids = np.resize(self._ids, cap)
+                grown = np.empty((cap, self.dim), dtype=np.float32)
+                grown[:self._size] = self._vecs[:self._size]
+                self._vecs = grown
+            self._ids[self._size:needed] = ids
+            self._vecs[self._size:needed] = vecs
+            self._size = needed
+
+        added = set(ids.tolist())
+        self._live |= added
+        self._removed -= added
+
+    def _mark_dirty(self, n: int):
+        # chamado com self._lock
+        self._pending += n
+        if self._flusher_pid != os.getpid():
+            # threads não sobrevivem ao fork do prefork: uma por processo
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name="event-index-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(EVENT_INDEX_FLUSH_SECONDS)
+            if not self._pending:
+                continue
+            try:
+                self.save()
+            except Exception as e:
+                logger.warning(f"Gravação do índice de eventos falhou: {e}")
+
+    def _after_fork(self):
+        # o lock pode ter sido herdado tomado pela thread de gravação do pai
+        self._lock = threading.Lock()
+
+    def add(self, ids, vectors):
+        if not len(ids):
+            return
+        vecs = _normalize(vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+
+        with self._lock:
+            self._add_locked(ids, vecs)
+            self._mark_dirty(len(ids))
+
+    def remove(self, ids):
+        """Retira eventos (compactados ou apagados por outro processo) do índice."""
+        if not len(ids):
+            return
+        with self._lock:
+            requested = {int(i) for i in ids}
+            # mesmo os que só existem em disco (gravados por outro processo):
+            # o próximo save() não os pode trazer de volta no merge
+            self._removed |= requested
+            self._mark_dirty(len(requested))
+            ids = [i for i in requested if i in self._live]
+            if not ids:
+                return
+            if self._hnsw is not None:
+                for i in ids:
+                    try:
+                        self._hnsw.mark_deleted(i)
+                    except RuntimeError:
+                        pass
+            else:
+                keep = ~np.isin(self._ids[:self._size], np.asarray(ids, dtype=np.int64))
+                kept = int(keep.sum())
+                self._ids[:kept] = self._ids[:self._size][keep]
+                self._vecs[:kept] = self._vecs[:self._size][keep]
+                self._size = kept
+            self._live.difference_update(ids)
+
+    # ---------- leitura ----------
+    def ids(self) -> set:
+        with self._lock:
+            return set(self._live)
+
+    def search(self, vector, k: int = 5):
+        """Retorna [(event_id, similaridade_cosseno)] do mais ao menos similar."""
+        live = len(self._live)
+        if self.dim is None or live <= 0:
+            return []
+        q = _normalize(vector).reshape(1, -1)
+        k = min(k, live)
+
+        if self._hnsw is not None:
+            labels, dists = self._hnsw.knn_query(q, k=k)
+            return [(int(l), float(1.0 - d)) for l, d in zip(labels[0], dists[0])]
+
+        sims = self._vecs[:self._size] @ q[0]
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(int(self._ids[i]), float(sims[i])) for i in top]
+
+    def __len__(self):
+        return len(self._live)
+
+
+# ======================================================
+# BACKEND QDRANT (OPCIONAL)
+# ======================================================
+class QdrantEventIndex:
+    """Mesma interface do LocalEventIndex sobre o container Qdrant."""
+
+    shared = True
+
+    def __init__(self, url: str = QDRANT_URL, collection: str = QDRANT_COLLECTION):
+        self.client = QdrantClient(url=url)
+        self.collection = collection
+        self.dim = None
+
+    def _ensure_collection(self, dim: int):
+        if self.dim is not None:
+            return
+        existing = {c.name for c in self.client.get_collections().collections}
+        if self.collection not in existing:
+            self.client.create_collection(
+                collection_name=self.collection,
+                vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+            )
+        self.dim = dim
+
+    def add(self, ids, vectors):
+        if not len(ids):
+            return
+        vecs = _normalize(vectors)
+        self._ensure_collection(vecs.shape[1])
+        self.client.upsert(
+            collection_name=self.collection,
+            points=[
+                PointStruct(id=int(i), vector=v.tolist())
+                for i, v in zip(ids, vecs)
+            ]
+        )
+
+    def remove(self, ids):
+        try:
+            self.client.delete(
+                collection_name=self.collection,
+                points_selector=PointIdsList(points=[int(i) for i in ids])
+            )
+        except Exception as e:
+            logger.warning(f"Remoção no Qdrant falhou: {e}")
+
+    def search(self, vector, k: int = 5):
+        q = _normalize(vector)
+        try:
+            hits = self.client.search(
+                collection_name=self.collection,
+                query_vector=q.tolist(),
+                limit=k
+            )
+        except Exception as e:
+            logger.warning(f"Busca no Qdrant falhou: {e}")
+            return []
+        return [(int(h.id), float(h.score)) for h in hits]
+
+    def save(self):
+        pass
+
+
+# ======================================================
+# SINGLETON
+# ======================================================
+_EVENT_INDEX = None
+
+
+def get_event_index():
+    global _EVENT_INDEX
+    if _EVENT_INDEX is None:
+        if EVENT_INDEX_BACKEND == "qdrant" and HAS_QDRANT:
+            _EVENT_INDEX = QdrantEventIndex()
+        else:
+            if EVENT_INDEX_BACKEND == "qdrant":
+                logger.warning("qdrant_client não instalado; usando índice local.")
+            _EVENT_INDEX = LocalEventIndex()
+            # filhos do prefork não correm o atexit: ver worker_process_shutdown
+            atexit.register(_EVENT_INDEX.save)
+            if hasattr(os, "register_at_fork"):
+                os.register_at_fork(after_in_child=_EVENT_INDEX._after_fork)
+    return _EVENT_INDEX
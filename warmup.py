@@ -0,0 +1,88 @@
+# python/app/warmup.py
+import os
+import gc
+import time
+import logging
+
+logger = logging.getLogger("horaculo.warmup")
+
+# Frases curtas só para exercitar tokenizer, pesos e kernels uma vez
+WARMUP_TEXTS = [
+    "Oil prices rise as OPEC signals deeper output cuts.",
+    "Stocks fall on renewed recession fears."
+]
+
+
+def cuda_available() -> bool:
+    # verificação via NVML: não inicializa o CUDA no pai antes do fork
+    os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def set_torch_threads(n: int):
+    """Limita os threads intra-op do torch (um processo por core lógico livre)."""
+    import torch
+    torch.set_num_threads(max(1, int(n)))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # só pode ser definido antes do primeiro trabalho paralelo
+        pass
+
+
+def warm_models(embeddings: bool = True, sentiment: bool = True, engine: bool = True) -> dict:
+    """
+    Carrega e exercita o sentence encoder, o FinBERT e o core C++.
+    Usa os mesmos módulos que o orchestrator (os singletons são por módulo).
+    Devolve o tempo de cada componente em segundos.
+    """
+    timings = {}
+    vectors = [[1.0, 0.0], [0.0, 1.0]]
+
+    if embeddings:
+        t0 = time.perf_counter()
+        from embeddings import load_model
+        encoded = load_model().encode(
+            WARMUP_TEXTS,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        vectors = encoded.tolist()
+        timings["embeddings"] = time.perf_counter() - t0
+
+    if sentiment:
+        t0 = time.perf_counter()
+        from sentiment import get_pipeline
+        get_pipeline()(WARMUP_TEXTS, truncation=True)
+        timings["sentiment"] = time.perf_counter() - t0
+
+    if engine:
+        t0 = time.perf_counter()
+        import core
+        core.HoraculoEngine(0.92).analyze_batch(vectors, ["warmup-a", "warmup-b"])
+        timings["engine"] = time.perf_counter() - t0
+
+    logger.info("Warmup: " + ", ".join(f"{k}={v:.2f}s" for k, v in timings.items()))
+    return timings
+
+
+def preload_for_fork() -> dict:
+    """
+    Warmup no processo pai antes do prefork: os filhos herdam os pesos por
+    copy-on-write. Corre com 1 thread para não deixar um pool OpenMP ativo
+    no fork, e congela o GC para ele não tocar (copiar) as páginas partilhadas.
+    """
+    set_torch_threads(1)
+    timings = warm_models()
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    return timings
+
+
+def default_child_threads(concurrency: int) -> int:
+    return max(1, (os.cpu_count() or 1) // max(1, concurrency))
@@ -1,14 +1,64 @@
 # python/app/worker.py
-from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 import os
+import time
 import asyncio
-from app.orchestrator import run_query
-from app.sentiment import get_pipeline # Garante que o modelo carrega aqui
+import logging
+from app.celery_app import celery, HOT_REFRESH_INTERVAL
+from app.orchestrator import init_storage, run_query
+from app.warmup import cuda_available, default_child_threads, preload_for_fork, set_torch_threads, warm_models
+# mesmo caminho de import do orchestrator: um só módulo (conexão, índice, matcher)
+from memory import compact_event_history
+from vector_memory import get_event_index
+from alerts import flush_alerts
+from app.cache import clear_inflight_task, register_refresh_handler, refresh_hot_queries, touch_inflight_task
+from app.admission import record_task_seconds
+from app.progress import DONE, ERROR, final_payload, publish_stage, stage_publisher
+
+logger = logging.getLogger("horaculo.worker")
+
+# ======================================================
+# BOOTSTRAP (PREFORK)
+# ======================================================
+# Modelos carregados no pai antes do fork: N filhos partilham uma cópia dos
+# pesos (copy-on-write) e nenhum paga o cold start na primeira tarefa.
+WORKER_PRELOAD_MODELS = os.getenv("WORKER_PRELOAD_MODELS", "1") == "1"
+# Threads torch por filho; 0 = cores / concurrency
+WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", "0"))
+_CHILD_THREADS = 1
+
+
+@worker_init.connect
+def preload_models(sender=None, **kwargs):
+    global _CHILD_THREADS
+    concurrency = getattr(sender, "concurrency", None) or 1
+    _CHILD_THREADS = WORKER_TORCH_THREADS or default_child_threads(concurrency)
+    if not WORKER_PRELOAD_MODELS:
+        return
+    if cuda_available():
+        # um contexto CUDA não sobrevive ao fork: cada filho carrega o seu
+        logger.info("GPU detetada: modelos carregados em cada processo filho.")
+        return
+    logger.info(f"Pré-carregando modelos para {concurrency} processos ({_CHILD_THREADS} threads cada)...")
+    preload_for_fork()
+
+
+@worker_process_init.connect
+def init_child(**kwargs):
+    set_torch_threads(_CHILD_THREADS)
+    if WORKER_PRELOAD_MODELS and cuda_available():
+        warm_models()
+
+
+@worker_process_shutdown.connect
+def shutdown_child(**kwargs):
+    # o filho sai com os._exit: o atexit não corre, grava/envia aqui o que falta
+    flush_alerts(5.0)
+    try:
+        get_event_index().save()
+    except Exception as e:
+        logger.warning(f"Gravação final do índice de eventos falhou: {e}")
 
-# Configuração do Celery apontando para o Redis
-celery = Celery(__name__)
-celery.conf.broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
-celery.conf.result_backend = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
 
 # Tarefa Pesada
 @celery.task(name="analyze_market_task", bind=True)
@@ -18,6 +68,9 @@ def analyze_market_task(self, query, newsapi_key, use_openai, openai_key):
     É aqui que o FinBERT e o C++ Core vão rodar, libertando a API.
     """
     # Nota: run_query é síncrona, perfeito para o Celery worker
+    started = time.monotonic()
+    # assumida: o dedupe deixa de expirar com a espera na fila
+    touch_inflight_task(query, self.request.id, use_openai=use_openai)
     try:
         print(f"I [Worker] Iniciando análise para: {query}")
         
@@ -27,10 +80,57 @@ def analyze_market_task(self, query, newsapi_key, use_openai, openai_key):
             query=query, 
             newsapi_key=newsapi_key, 
             use_openai=use_openai, 
-            openai_key=openai_key
+            openai_key=openai_key,
+            # telas parciais para /analyze/stream/{task_id}
+            on_stage=stage_publisher(self.request.id)
         )
+        publish_stage(self.request.id, DONE, final_payload(result))
         return result
     except Exception as e:
         # Log de erro e re-raise para o Celery marcar como FAILED
         print(f"E [Worker] Falha: {e}")
+        publish_stage(self.request.id, ERROR, {"error": str(e)})
         raise e
+    finally:
+        # liberta o slot de dedupe do /analyze/submit
+        clear_inflight_task(query, self.request.id, use_openai=use_openai)
+        # duração por fila: base da espera estimada na admissão
+        queue = (self.request.delivery_info or {}).get("routing_key") or "interactive"
+        record_task_seconds(queue, time.monotonic() - started)
+
+
+@celery.task(name="compact_event_history_task")
+def compact_event_history_task():
+    """Retenção do event_history: agrega e remove eventos antigos."""
+    init_storage()
+    return compact_event_history()
+
+
+@celery.task(name="refresh_analysis_task")
+def refresh_analysis_task(query, use_openai=False):
+    """Revalida uma entrada stale/quente do cache fora do caminho do utilizador."""
+    started = time.monotonic()
+    try:
+        run_query(
+            query=query,
+            newsapi_key=os.getenv("NEWSAPI_KEY"),
+            use_openai=use_openai,
+            openai_key=os.getenv("OPENAI_API_KEY"),
+            force_refresh=True,
+            # fora do caminho do utilizador: resultado completo, sem orçamento
+            budget_seconds=0
+        )
+    finally:
+        record_task_seconds("scheduled", time.monotonic() - started)
+    return {"refreshed": query}
+
+
+@celery.task(name="refresh_hot_queries_task")
+def refresh_hot_queries_task():
+    # antecipa: refresca o que ficaria stale antes do próximo ciclo
+    return refresh_hot_queries(lead_time=HOT_REFRESH_INTERVAL)
+
+
+register_refresh_handler(
+    lambda query, use_openai: refresh_analysis_task.delay(query, use_openai)
+)